@@ -2,52 +2,129 @@
 Main application entry point for Written AI Chatbot
 """
 
-from flask import Flask
-from flask_cors import CORS
-from config.settings import settings
-from src.web.routes import bp as web_bp
-from src.database.models import init_db
-from loguru import logger
+import atexit
 import sys
+from src import startup_profiler
+
+# Must be enabled before the imports below so they are included in the profile
+if startup_profiler.is_requested():
+    startup_profiler.enable()
+
+from flask import Flask
+from config.settings import get_settings
 
 
 def create_app():
     """Create and configure the Flask application"""
+    phase = startup_profiler.phase
+    
+    # Deferred so that `import app` stays cheap for CLI tools and test collection
+    with phase("imports"):
+        from flask_cors import CORS
+        from flask_compress import Compress
+        from loguru import logger
+        from src.web.routes import bp as web_bp
+        from src.web.json_provider import ORJSONProvider
+        from src.database.models import init_db
+        from src.database.activity_writer import activity_writer
+    
     app = Flask(__name__)
+    app.json = ORJSONProvider(app)
+    # Flask 3 dropped JSON_SORT_KEYS/JSONIFY_PRETTYPRINT_REGULAR; configure the provider instead
+    app.json.sort_keys = False
+    app.json.compact = True
     
     # Configure Flask
-    app.config['SECRET_KEY'] = settings.secret_key
-    app.config['SQLALCHEMY_DATABASE_URI'] = settings.database_url
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    
-    # Configure PostgreSQL-specific settings if using PostgreSQL
-    if settings.database_url.startswith('postgresql://'):
-        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-            'pool_size': 10,
-            'pool_timeout': 20,
-            'pool_recycle': 3600,
-            'max_overflow': 20,
-            'pool_pre_ping': True
-        }
+    with phase("config"):
+        _configure_app(app)
     
     # Enable CORS
-    CORS(app)
+    with phase("cors"):
+        CORS(app)
+    
+    # Compress larger JSON/HTML responses
+    with phase("compress"):
+        Compress(app)
     
     # Configure logging
-    logger.remove()
-    logger.add(sys.stderr, level=settings.log_level)
-    logger.add("logs/written.log", rotation="1 day", level=settings.log_level)
+    with phase("logging"):
+        settings = get_settings()
+        logger.remove()
+        logger.add(sys.stderr, level=settings.log_level)
+        logger.add(
+            "logs/written.log",
+            rotation="1 day",
+            level=settings.log_level,
+            enqueue=True,  # Write from a background thread, off the request path
+            backtrace=False,
+            diagnose=False,
+            serialize=False
+        )
     
     # Initialize database
-    init_db(app)
+    with phase("init_db"):
+        init_db(app)
+        activity_writer.init_app(app)
     
     # Register blueprints
-    app.register_blueprint(web_bp)
+    with phase("blueprints"):
+        app.register_blueprint(web_bp)
     
     logger.info("Written AI Chatbot application initialized")
     return app
 
 
+# Flask has no shutdown event, so release upstream connections at interpreter exit;
+# registered once here rather than in create_app, which may run many times
+@atexit.register
+def _close_clients():
+    """Close the shared AI and Taiga clients on the loop that owns their connections"""
+    from src import async_bridge
+    if not async_bridge.is_started():
+        return
+    
+    from src.ai.generator import ai_service
+    from src.api.taiga_client import taiga_api
+    
+    async def close():
+        await ai_service.aclose()
+        await taiga_api.close()
+    
+    async_bridge.run_async(close(), timeout=5.0)
+
+
+def _configure_app(app):
+    """Apply settings-driven Flask configuration"""
+    settings = get_settings()
+    app.config['SECRET_KEY'] = settings.secret_key
+    app.config['SQLALCHEMY_DATABASE_URI'] = settings.database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    
+    # Response compression; small bodies such as /api/health are sent as-is.
+    # Streamed responses compress themselves (see get_activities)
+    app.config['COMPRESS_MIMETYPES'] = ['application/json', 'text/html']
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    app.config['COMPRESS_LEVEL'] = 4
+    app.config['COMPRESS_BR_LEVEL'] = 4
+    app.config['COMPRESS_MIN_SIZE'] = 1024
+    app.config['COMPRESS_STREAMS'] = False
+    
+    # PostgreSQL pool settings (empty for SQLite)
+    engine_options = settings.engine_options
+    if engine_options:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+
+
 if __name__ == '__main__':
-    app = create_app()
-    app.run(debug=True, host='127.0.0.1', port=5001)
+    with startup_profiler.phase("create_app"):
+        app = create_app()
+    if startup_profiler.is_requested():
+        startup_profiler.report()
+    # Debug mode adds the reloader subprocess and debugger middleware; opt in via FLASK_DEBUG
+    settings = get_settings()
+    app.run(
+        debug=settings.flask_debug,
+        host=settings.flask_host,
+        port=settings.flask_port,
+        use_reloader=settings.flask_debug
+    )
@@ -3,8 +3,10 @@ Configuration module for Written AI Chatbot
 Handles environment variables and application settings
 """
 
-from pydantic_settings import BaseSettings
-from typing import Optional
+from functools import lru_cache
+from pydantic import computed_field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Optional, Dict, Any
 
 
 class Settings(BaseSettings):
@@ -12,14 +14,20 @@ class Settings(BaseSettings):
     
     # Flask Configuration
     flask_env: str = "development"
-    flask_debug: bool = True
+    flask_debug: bool = False
     flask_host: str = "127.0.0.1"
-    flask_port: int = 5000
+    flask_port: int = 5001
     secret_key: str = "dev-secret-key-change-in-production"
     
     # Database Configuration
     database_url: str = "sqlite:///written.db"
     
+    # Connection pool settings (PostgreSQL only)
+    db_pool_size: int = 25
+    db_max_overflow: int = 25
+    db_pool_recycle: int = 3600
+    db_pool_timeout: int = 20
+    
     # PostgreSQL specific settings (when not using database_url)
     postgres_host: str = "localhost"
     postgres_port: int = 5433
@@ -39,22 +47,62 @@ class Settings(BaseSettings):
     anthropic_api_key: Optional[str] = None
     anthropic_model: str = "claude-3-sonnet-20240229"
     
+    # Maximum concurrent in-flight requests per provider
+    gemini_max_concurrency: int = 30
+    openai_max_concurrency: int = 20
+    anthropic_max_concurrency: int = 10
+    
+    # Provider routing: "static" (preference order), "latency" (fastest healthy
+    # provider first) or "cost" (cheapest first, using provider_cost_per_1k)
+    ai_routing_mode: str = "static"
+    provider_cost_per_1k: Dict[str, float] = {}
+    
+    # AI response cache (set either value to 0 to disable)
+    ai_cache_max_entries: int = 4096
+    ai_cache_ttl_seconds: int = 3600
+    
     # Taiga API Configuration
     taiga_base_url: str = "<project_url>"
     taiga_username: Optional[str] = None
     taiga_password: Optional[str] = None
     taiga_auth_token: Optional[str] = None
     
+    # Maximum concurrent in-flight Taiga requests
+    taiga_max_concurrency: int = 16
+    
+    # How long project metadata is served from cache before revalidating (0 disables)
+    taiga_project_cache_ttl_seconds: int = 300
+    
     # Application Settings
     log_level: str = "INFO"
     default_activity_prompt: str = "Generate a professional daily activity description based on the following information:"
     max_activity_length: int = 500
     max_requests_per_hour: int = 100
     
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
+    @computed_field
+    @property
+    def engine_options(self) -> Dict[str, Any]:
+        """SQLAlchemy engine options for the configured database"""
+        # Stale connections are handled by pool_recycle rather than pre-ping,
+        # which would cost an extra round-trip on every checkout
+        if not self.database_url.startswith('postgresql://'):
+            return {}
+        return {
+            'pool_size': self.db_pool_size,
+            'pool_timeout': self.db_pool_timeout,
+            'pool_recycle': self.db_pool_recycle,
+            'max_overflow': self.db_max_overflow,
+            'pool_use_lifo': True  # Keep the hot subset of connections warm
+        }
+    
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=False,
+        frozen=True
+    )
 
 
-# Global settings instance
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the application settings, loading them on first use"""
+    return Settings()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Database migrations for Written AI Chatbot
+Creates missing tables and migrates older schemas; run once per deployment
+"""
+import sys
+import os
+
+# Add the project root to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.database.models import init_db, migrate_legacy_user_positions
+from config.settings import get_settings
+
+
+def _make_minimal_app():
+    """Create a bare Flask app with only the database configured"""
+    from flask import Flask
+    
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = get_settings().database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_db(app)
+    return app
+
+
+def migrate():
+    """Run all pending migrations"""
+    print("🚀 Initializing database...")
+    app = _make_minimal_app()
+    
+    with app.app_context():
+        print("🔄 Migrating user positions...")
+        if not migrate_legacy_user_positions():
+            print("⚠️  Some users have a position without a matching user_positions row;")
+            print("   the legacy users.position columns were kept. Add those positions and re-run.")
+            return False
+    
+    return True
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🗄️  Written AI Chatbot - Database Migration")
+    print("=" * 60)
+    
+    if migrate():
+        print("\n✨ Database migration complete!")
+    else:
+        print("\n❌ Database migration incomplete!")
+        sys.exit(1)
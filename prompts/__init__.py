@@ -0,0 +1,3 @@
+"""
+Prompt templates for Written AI Chatbot
+"""
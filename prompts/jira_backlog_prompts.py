@@ -3,6 +3,10 @@ Advanced AI Prompts for Task Backlog Generation (Jira-style)
 These prompts help LLMs generate professional task descriptions suitable for project management tools
 """
 
+import json
+import sys
+from functools import lru_cache
+
 # Base prompt for task backlog generation
 JIRA_TASK_PROMPT = """You are an expert product manager and technical writer who specializes in creating clear, actionable task descriptions for project management tools like Jira, Azure DevOps, and Taiga.
 
@@ -37,9 +41,11 @@ Return a JSON structure with the following fields:
 }
 """
 
-# Position-specific prompt modifications
-POSITION_SPECIFIC_PROMPTS = {
-    "backend": """
+
+def _build_position_prompts() -> dict:
+    """Position-specific prompt modifications"""
+    return {
+        "backend": """
 BACKEND DEVELOPER FOCUS:
 - Emphasize API design, database schemas, server architecture
 - Include performance considerations, scalability, security
@@ -49,7 +55,7 @@ BACKEND DEVELOPER FOCUS:
 - Include database migration needs if applicable
 """,
     
-    "frontend": """
+        "frontend": """
 FRONTEND DEVELOPER FOCUS:
 - Emphasize user interface, user experience, accessibility
 - Include responsive design considerations
@@ -60,7 +66,7 @@ FRONTEND DEVELOPER FOCUS:
 - Consider performance optimization (bundle size, loading times)
 """,
     
-    "fullstack": """
+        "fullstack": """
 FULLSTACK DEVELOPER FOCUS:
 - Balance frontend and backend considerations
 - Emphasize end-to-end implementation
@@ -69,7 +75,7 @@ FULLSTACK DEVELOPER FOCUS:
 - Mention deployment and DevOps considerations
 """,
     
-    "qa": """
+        "qa": """
 QA ENGINEER FOCUS:
 - Emphasize testing strategies and test cases
 - Include quality metrics and acceptance criteria
@@ -79,7 +85,7 @@ QA ENGINEER FOCUS:
 - Reference testing tools and frameworks
 """,
     
-    "devops": """
+        "devops": """
 DEVOPS ENGINEER FOCUS:
 - Emphasize infrastructure, deployment, monitoring
 - Include scalability and reliability considerations
@@ -89,7 +95,7 @@ DEVOPS ENGINEER FOCUS:
 - Reference cloud services, containerization
 """,
     
-    "product_manager": """
+        "product_manager": """
 PRODUCT MANAGER FOCUS:
 - Emphasize business value and user impact
 - Include market research, competitive analysis
@@ -99,7 +105,7 @@ PRODUCT MANAGER FOCUS:
 - Reference user analytics and A/B testing
 """,
     
-    "designer": """
+        "designer": """
 UX/UI DESIGNER FOCUS:
 - Emphasize user research, personas, user journeys
 - Include design systems, style guides, accessibility
@@ -108,11 +114,13 @@ UX/UI DESIGNER FOCUS:
 - Include design tools, prototyping, collaboration
 - Reference design patterns and best practices
 """
-}
+    }
+
 
-# Task type specific prompts
-TASK_TYPE_PROMPTS = {
-    "bug_fix": """
+def _build_task_type_prompts() -> dict:
+    """Task type specific prompts"""
+    return {
+        "bug_fix": """
 BUG FIX TASK:
 - Clearly describe the current behavior vs expected behavior
 - Include steps to reproduce the issue
@@ -122,7 +130,7 @@ BUG FIX TASK:
 - Include testing strategy to verify the fix
 """,
     
-    "feature": """
+        "feature": """
 NEW FEATURE TASK:
 - Describe the feature from user perspective
 - Include business justification and expected impact
@@ -132,7 +140,7 @@ NEW FEATURE TASK:
 - Consider rollout strategy and feature toggles
 """,
     
-    "improvement": """
+        "improvement": """
 IMPROVEMENT/ENHANCEMENT TASK:
 - Describe current limitations or pain points
 - Explain the proposed improvement and benefits
@@ -142,7 +150,7 @@ IMPROVEMENT/ENHANCEMENT TASK:
 - Include success criteria and measurements
 """,
     
-    "technical_debt": """
+        "technical_debt": """
 TECHNICAL DEBT TASK:
 - Explain the current technical issue or limitation
 - Describe the impact on development velocity or system performance
@@ -152,7 +160,7 @@ TECHNICAL DEBT TASK:
 - Include migration plan if needed
 """,
     
-    "research": """
+        "research": """
 RESEARCH/SPIKE TASK:
 - Define the research question or hypothesis
 - Include success criteria and deliverables
@@ -161,107 +169,214 @@ RESEARCH/SPIKE TASK:
 - Include documentation and knowledge sharing plan
 - Define next steps based on research outcomes
 """
-}
+    }
 
-# Examples for few-shot learning
-EXAMPLE_TRANSFORMATIONS = [
-    {
-        "user_input": "fix login bug",
-        "position": "backend",
-        "task_type": "bug_fix",
-        "expected_output": {
-            "title": "Fix authentication failure on login endpoint",
-            "description": "Users are experiencing login failures when attempting to authenticate through the /api/auth/login endpoint. The issue appears to be related to session management and affects approximately 15% of login attempts.\n\nAs a user, I want to be able to log in successfully so that I can access my account and use the application features.\n\nCurrent behavior: Login requests return 500 error intermittently\nExpected behavior: All valid login attempts should succeed with proper session creation",
-            "acceptance_criteria": [
-                "All valid login attempts succeed with 2xx response",
-                "Session is properly created and stored",
-                "Error logging is implemented for failed attempts",
-                "Unit tests cover the login flow",
-                "Integration tests verify end-to-end authentication"
-            ],
-            "story_points": "5",
-            "priority": "High",
-            "labels": ["bug", "authentication", "backend", "critical"],
-            "component": "Authentication Service"
-        }
-    },
-    {
-        "user_input": "create user dashboard",
-        "position": "frontend",
-        "task_type": "feature",
-        "expected_output": {
-            "title": "Implement user dashboard with activity overview",
-            "description": "Create a comprehensive user dashboard that provides users with an overview of their recent activities, statistics, and quick access to key features.\n\nAs a user, I want to see a personalized dashboard when I log in so that I can quickly understand my current status and access important features.\n\nThe dashboard should be responsive, accessible, and provide a great user experience across all devices.",
-            "acceptance_criteria": [
-                "Dashboard loads within 2 seconds",
-                "Displays user's recent activities (last 10 items)",
-                "Shows key statistics (total activities, hours logged, etc.)",
-                "Includes quick action buttons for common tasks",
-                "Responsive design works on mobile and desktop",
-                "Meets WCAG 2.1 AA accessibility standards"
-            ],
-            "story_points": "8",
-            "priority": "Medium",
-            "labels": ["feature", "dashboard", "frontend", "ui"],
-            "component": "User Interface"
+
+def _build_example_transformations() -> list:
+    """Examples for few-shot learning"""
+    return [
+        {
+            "user_input": "fix login bug",
+            "position": "backend",
+            "task_type": "bug_fix",
+            "expected_output": {
+                "title": "Fix authentication failure on login endpoint",
+                "description": "Users are experiencing login failures when attempting to authenticate through the /api/auth/login endpoint. The issue appears to be related to session management and affects approximately 15% of login attempts.\n\nAs a user, I want to be able to log in successfully so that I can access my account and use the application features.\n\nCurrent behavior: Login requests return 500 error intermittently\nExpected behavior: All valid login attempts should succeed with proper session creation",
+                "acceptance_criteria": [
+                    "All valid login attempts succeed with 2xx response",
+                    "Session is properly created and stored",
+                    "Error logging is implemented for failed attempts",
+                    "Unit tests cover the login flow",
+                    "Integration tests verify end-to-end authentication"
+                ],
+                "story_points": "5",
+                "priority": "High",
+                "labels": ["bug", "authentication", "backend", "critical"],
+                "component": "Authentication Service"
+            }
+        },
+        {
+            "user_input": "create user dashboard",
+            "position": "frontend",
+            "task_type": "feature",
+            "expected_output": {
+                "title": "Implement user dashboard with activity overview",
+                "description": "Create a comprehensive user dashboard that provides users with an overview of their recent activities, statistics, and quick access to key features.\n\nAs a user, I want to see a personalized dashboard when I log in so that I can quickly understand my current status and access important features.\n\nThe dashboard should be responsive, accessible, and provide a great user experience across all devices.",
+                "acceptance_criteria": [
+                    "Dashboard loads within 2 seconds",
+                    "Displays user's recent activities (last 10 items)",
+                    "Shows key statistics (total activities, hours logged, etc.)",
+                    "Includes quick action buttons for common tasks",
+                    "Responsive design works on mobile and desktop",
+                    "Meets WCAG 2.1 AA accessibility standards"
+                ],
+                "story_points": "8",
+                "priority": "Medium",
+                "labels": ["feature", "dashboard", "frontend", "ui"],
+                "component": "User Interface"
+            }
         }
-    }
-]
+    ]
 
-def get_enhanced_prompt(user_input: str, position: str = None, task_type: str = None, context: dict = None) -> str:
+
+# The large prompt tables are built on first access (PEP 562), so importing
+# this module stays cheap for processes that never assemble a prompt
+_LAZY_ATTRIBUTES = {
+    "POSITION_SPECIFIC_PROMPTS": _build_position_prompts,
+    "TASK_TYPE_PROMPTS": _build_task_type_prompts,
+    "EXAMPLE_TRANSFORMATIONS": _build_example_transformations,
+}
+
+
+def __getattr__(name):
+    builder = _LAZY_ATTRIBUTES.get(name)
+    if builder is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = builder()
+    return value
+
+
+@lru_cache(maxsize=1)
+def _prompt_tables() -> tuple:
     """
-    Generate an enhanced prompt for task backlog generation
+    Render the static prompt pieces on first use
     
-    Args:
-        user_input: Brief description from user
-        position: User's role/position
-        task_type: Type of task (bug_fix, feature, improvement, etc.)
-        context: Additional context (project, sprint, etc.)
+    Returns:
+        Tuple of (static prefix, position lookup, task type lookup)
+    """
+    module = sys.modules[__name__]
+    
+    # Static prompt prefix (base prompt + few-shot examples)
+    example_strs = tuple(
+        f'\nInput: "{example["user_input"]}" (Position: {example["position"]}, Type: {example["task_type"]})\n'
+        f'Output: {json.dumps(example["expected_output"], ensure_ascii=False)}\n'
+        for example in module.EXAMPLE_TRANSFORMATIONS[:2]  # Include 2 examples
+    )
+    base_with_examples = JIRA_TASK_PROMPT + "\n\nEXAMPLES:\n" + "\n".join(example_strs)
+    
+    # Case-insensitive lookups for position and task type guidance (keys interned)
+    position_lc = {sys.intern(key.lower()): value for key, value in module.POSITION_SPECIFIC_PROMPTS.items()}
+    task_lc = {sys.intern(key.lower()): value for key, value in module.TASK_TYPE_PROMPTS.items()}
+    
+    return base_with_examples, position_lc, task_lc
+
+
+def get_static_prompt_prefix() -> str:
+    """
+    Get the leading part of every enhanced prompt (base prompt + examples)
+    
+    It is identical across calls, which makes it a good target for
+    provider-side prompt caching.
+    """
+    return _prompt_tables()[0]
+
+
+# Context fields included in the prompt, in order, with their labels
+_CONTEXT_FIELDS = (
+    ('project_name', 'Project'),
+    ('sprint', 'Sprint'),
+    ('epic', 'Epic'),
+    ('related_tickets', 'Related tickets'),
+)
+
+
+def _context_key(context: dict = None) -> tuple:
+    """Render the prompt-relevant context fields into a hashable key"""
+    if not context:
+        return ()
+    return tuple(f"{label}: {context[field]}" for field, label in _CONTEXT_FIELDS if context.get(field))
+
+
+# Closes the prompt text that precedes the user input
+_INPUT_LEAD_IN = "\n\n\nNow, transform this user input into a professional task description:\n\nUser input: "
+
+
+@lru_cache(maxsize=64)
+def _get_specialized_frame(position: str = None, task_type: str = None) -> tuple:
+    """
+    Build the prompt parts fixed by position and task type
+    
+    There are only a few dozen position/task type combinations, so each
+    one is assembled once and shared by every context it is used with.
     
     Returns:
-        Enhanced prompt string
+        Tuple of (guidance text preceding the context, text after the user input)
     """
-    prompt_parts = [JIRA_TASK_PROMPT]
+    base_with_examples, position_lc, task_lc = _prompt_tables()
+    prompt_parts = [base_with_examples]
     
     # Add position-specific guidance
-    if position and position.lower() in POSITION_SPECIFIC_PROMPTS:
-        prompt_parts.append(POSITION_SPECIFIC_PROMPTS[position.lower()])
+    position_snippet = position_lc.get(position.lower()) if position else None
+    if position_snippet:
+        prompt_parts.append(position_snippet)
     
     # Add task type specific guidance
-    if task_type and task_type.lower() in TASK_TYPE_PROMPTS:
-        prompt_parts.append(TASK_TYPE_PROMPTS[task_type.lower()])
+    task_snippet = task_lc.get(task_type.lower()) if task_type else None
+    if task_snippet:
+        prompt_parts.append(task_snippet)
+    
+    suffix_parts = []
+    if position:
+        suffix_parts.append(f"Position: {position}")
+    if task_type:
+        suffix_parts.append(f"Task type: {task_type}")
+    suffix_parts.append("\nGenerate the task description following the JSON format above:")
+    
+    return "\n\n".join(prompt_parts), "\n\n" + "\n\n".join(suffix_parts)
+
+
+@lru_cache(maxsize=256)
+def _get_prompt_frame(position: str = None, task_type: str = None, context_key: tuple = ()) -> tuple:
+    """
+    Build the prompt text surrounding the user input
+    
+    Everything except the user input depends only on position, task type
+    and context, so the frame is cached and reused across requests.
+    
+    Returns:
+        Tuple of (text before the user input, text after the user input)
+    """
+    guidance, suffix = _get_specialized_frame(position, task_type)
     
     # Add context information
-    if context:
-        context_info = []
-        if context.get('project_name'):
-            context_info.append(f"Project: {context['project_name']}")
-        if context.get('sprint'):
-            context_info.append(f"Sprint: {context['sprint']}")
-        if context.get('epic'):
-            context_info.append(f"Epic: {context['epic']}")
-        if context.get('related_tickets'):
-            context_info.append(f"Related tickets: {context['related_tickets']}")
-        
-        if context_info:
-            prompt_parts.append("CONTEXT:\n" + "\n".join(context_info))
+    if context_key:
+        guidance = guidance + "\n\nCONTEXT:\n" + "\n".join(context_key)
     
-    # Add examples for better results
-    prompt_parts.append("\nEXAMPLES:")
-    for example in EXAMPLE_TRANSFORMATIONS[:2]:  # Include 2 examples
-        prompt_parts.append(f"""
-Input: "{example['user_input']}" (Position: {example['position']}, Type: {example['task_type']})
-Output: {example['expected_output']}
-""")
+    # The actual user input goes between the prefix and the suffix
+    return guidance + _INPUT_LEAD_IN, suffix
+
+
+@lru_cache(maxsize=256)
+def _get_prompt_frame_bytes(position: str = None, task_type: str = None, context_key: tuple = ()) -> tuple:
+    """UTF-8 encoded variant of _get_prompt_frame"""
+    prefix, suffix = _get_prompt_frame(position, task_type, context_key)
+    return prefix.encode(), suffix.encode()
+
+
+def get_enhanced_prompt(user_input: str, position: str = None, task_type: str = None, context: dict = None) -> str:
+    """
+    Generate an enhanced prompt for task backlog generation
     
-    # Add the actual user input
-    prompt_parts.append(f"\nNow, transform this user input into a professional task description:")
-    prompt_parts.append(f"User input: {user_input}")
-    if position:
-        prompt_parts.append(f"Position: {position}")
-    if task_type:
-        prompt_parts.append(f"Task type: {task_type}")
+    Args:
+        user_input: Brief description from user
+        position: User's role/position
+        task_type: Type of task (bug_fix, feature, improvement, etc.)
+        context: Additional context (project, sprint, etc.)
     
-    prompt_parts.append("\nGenerate the task description following the JSON format above:")
+    Returns:
+        Enhanced prompt string
+    """
+    prefix, suffix = _get_prompt_frame(position, task_type, _context_key(context))
+    return prefix + str(user_input) + suffix
+
+
+def get_enhanced_prompt_bytes(user_input: str, position: str = None, task_type: str = None, context: dict = None) -> bytes:
+    """
+    Same as get_enhanced_prompt, but returns the prompt UTF-8 encoded
     
-    return "\n\n".join(prompt_parts)
+    The surrounding frame is cached pre-encoded, so only the user input
+    is encoded per call. Useful when the prompt goes straight into an
+    HTTP request body.
+    """
+    prefix, suffix = _get_prompt_frame_bytes(position, task_type, _context_key(context))
+    return prefix + str(user_input).encode() + suffix
@@ -4,88 +4,121 @@ Initialize user positions for Written AI Chatbot
 """
 import sys
 import os
+import hashlib
 
 # Add the project root to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from src.database.models import db, UserPosition, init_db
-from config.settings import settings
+from src import startup_profiler
+
+# Must be enabled before the imports below so they are included in the profile
+if startup_profiler.is_requested():
+    startup_profiler.enable()
+
+from src.database.models import db, UserPosition, AppMetadata, init_db
+from config.settings import get_settings
+
+# Default positions as (position name, activity prefix) pairs
+_POSITIONS: tuple[tuple[str, str], ...] = (
+    # Development Team
+    ("Frontend Developer", "FE"),
+    ("Backend Developer", "BE"),
+    ("Full Stack Developer", "FS"),
+    ("Mobile Developer", "MD"),
+    ("DevOps Engineer", "DO"),
+
+    # Design & UX
+    ("UI/UX Designer", "UX"),
+    ("Graphic Designer", "GD"),
+    ("Product Designer", "PD"),
+
+    # Management & Leadership
+    ("Project Manager", "PM"),
+    ("Product Manager", "PDM"),
+    ("Tech Lead", "TL"),
+    ("Engineering Manager", "EM"),
+    ("Scrum Master", "SM"),
+
+    # Quality Assurance
+    ("QA Engineer", "QA"),
+    ("Test Automation Engineer", "TAE"),
+    ("QA Lead", "QAL"),
+
+    # Data & Analytics
+    ("Data Analyst", "DA"),
+    ("Data Engineer", "DE"),
+    ("Data Scientist", "DS"),
+    ("Business Intelligence", "BI"),
+
+    # Security & Infrastructure
+    ("Security Engineer", "SE"),
+    ("System Administrator", "SA"),
+    ("Cloud Engineer", "CE"),
+    ("Site Reliability Engineer", "SRE"),
+
+    # Business & Strategy
+    ("Business Analyst", "BA"),
+    ("Product Owner", "PO"),
+    ("Solution Architect", "ARCH"),
+    ("Technical Writer", "TW"),
+
+    # Customer & Support
+    ("Customer Success", "CS"),
+    ("Technical Support", "TS"),
+    ("Sales Engineer", "SEN"),
+)
+
+# Metadata key recording which version of _POSITIONS has been seeded
+_SEED_KEY = "positions_seeded"
+_POSITIONS_HASH = hashlib.sha256(repr(_POSITIONS).encode()).hexdigest()
+
+def _make_minimal_app():
+    """Create a bare Flask app with only the database configured"""
+    from flask import Flask
+    
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = get_settings().database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    init_db(app)
+    return app
 
 def populate_positions():
     """Populate the database with default user positions"""
-    from app import create_app
-    
-    positions_data = [
-        # Development Team
-        {"position": "Frontend Developer", "position_prefix": "FE"},
-        {"position": "Backend Developer", "position_prefix": "BE"},
-        {"position": "Full Stack Developer", "position_prefix": "FS"},
-        {"position": "Mobile Developer", "position_prefix": "MD"},
-        {"position": "DevOps Engineer", "position_prefix": "DO"},
-        
-        # Design & UX
-        {"position": "UI/UX Designer", "position_prefix": "UX"},
-        {"position": "Graphic Designer", "position_prefix": "GD"},
-        {"position": "Product Designer", "position_prefix": "PD"},
-        
-        # Management & Leadership
-        {"position": "Project Manager", "position_prefix": "PM"},
-        {"position": "Product Manager", "position_prefix": "PDM"},
-        {"position": "Tech Lead", "position_prefix": "TL"},
-        {"position": "Engineering Manager", "position_prefix": "EM"},
-        {"position": "Scrum Master", "position_prefix": "SM"},
-        
-        # Quality Assurance
-        {"position": "QA Engineer", "position_prefix": "QA"},
-        {"position": "Test Automation Engineer", "position_prefix": "TAE"},
-        {"position": "QA Lead", "position_prefix": "QAL"},
-        
-        # Data & Analytics
-        {"position": "Data Analyst", "position_prefix": "DA"},
-        {"position": "Data Engineer", "position_prefix": "DE"},
-        {"position": "Data Scientist", "position_prefix": "DS"},
-        {"position": "Business Intelligence", "position_prefix": "BI"},
-        
-        # Security & Infrastructure
-        {"position": "Security Engineer", "position_prefix": "SE"},
-        {"position": "System Administrator", "position_prefix": "SA"},
-        {"position": "Cloud Engineer", "position_prefix": "CE"},
-        {"position": "Site Reliability Engineer", "position_prefix": "SRE"},
-        
-        # Business & Strategy
-        {"position": "Business Analyst", "position_prefix": "BA"},
-        {"position": "Product Owner", "position_prefix": "PO"},
-        {"position": "Solution Architect", "position_prefix": "ARCH"},
-        {"position": "Technical Writer", "position_prefix": "TW"},
-        
-        # Customer & Support
-        {"position": "Customer Success", "position_prefix": "CS"},
-        {"position": "Technical Support", "position_prefix": "TS"},
-        {"position": "Sales Engineer", "position_prefix": "SEN"},
-    ]
-    
-    print("🚀 Creating Flask app and initializing database...")
-    app = create_app()
+    print("🚀 Initializing database...")
+    with startup_profiler.phase("make_minimal_app"):
+        app = _make_minimal_app()
     
     with app.app_context():
+        # Skip everything if this exact list of positions was already seeded
+        marker = db.session.get(AppMetadata, _SEED_KEY)
+        if marker and marker.value == _POSITIONS_HASH:
+            print("✅ Default positions already seeded, nothing to do")
+            return True
+        
         print("📝 Adding user positions...")
-        added_count = 0
         
-        for pos_data in positions_data:
-            # Check if position already exists
-            existing = UserPosition.query.filter_by(position_name=pos_data["position"]).first()
-            if not existing:
-                position = UserPosition(
-                    position_name=pos_data["position"],
-                    position_prefix=pos_data["position_prefix"]
-                )
-                db.session.add(position)
-                added_count += 1
-                print(f"  ✅ Added: {pos_data['position']} ({pos_data['position_prefix']})")
+        # Fetch all already-present positions in a single query
+        existing = {
+            row[0] for row in db.session.query(UserPosition.position_name).filter(
+                UserPosition.position_name.in_([name for name, _ in _POSITIONS])
+            ).all()
+        }
+        
+        new_positions = []
+        lines = []
+        for name, prefix in _POSITIONS:
+            if name not in existing:
+                new_positions.append(UserPosition(position_name=name, position_prefix=prefix))
+                lines.append(f"  ✅ Added: {name} ({prefix})")
             else:
-                print(f"  ⚠️  Exists: {pos_data['position']} ({pos_data['position_prefix']})")
+                lines.append(f"  ⚠️  Exists: {name} ({prefix})")
+        sys.stdout.write("\n".join(lines) + "\n")
+        
+        added_count = len(new_positions)
         
         try:
+            db.session.bulk_save_objects(new_positions)
+            db.session.merge(AppMetadata(key=_SEED_KEY, value=_POSITIONS_HASH))
             db.session.commit()
             print(f"\n🎉 Successfully added {added_count} positions to database!")
             
@@ -105,7 +138,10 @@ if __name__ == "__main__":
     print("🏗️  Written AI Chatbot - Position Initialization")
     print("=" * 60)
     
-    success = populate_positions()
+    with startup_profiler.phase("populate_positions"):
+        success = populate_positions()
+    if startup_profiler.is_requested():
+        startup_profiler.report()
     
     if success:
         print("\n✨ Position initialization complete!")
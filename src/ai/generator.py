@@ -3,50 +3,481 @@ AI service integration for Written chatbot
 Handles communication with AI providers (OpenAI, Anthropic, etc.)
 """
 
-from typing import Optional, Dict, Any
-from config.settings import settings
+from functools import cached_property, lru_cache
+from types import MappingProxyType
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator
+from config.settings import get_settings
+from src.ai.prompt_cache import PromptCache
 from loguru import logger
 import asyncio
 import aiohttp
 import json
-import sys
-import os
+import random
+import threading
+import time
 
-# Add prompts directory to path
-sys.path.append(os.path.join(os.path.dirname(__file__), '../../prompts'))
+try:
+    import orjson
+except ImportError:  # stdlib fallback
+    orjson = None
+
+# Provider SDKs are optional; a provider whose package is missing fails when called
+try:
+    from openai import AsyncOpenAI
+    import httpx
+except ImportError:
+    AsyncOpenAI = None
 
 try:
-    from jira_backlog_prompts import get_enhanced_prompt, POSITION_SPECIFIC_PROMPTS
+    from anthropic import AsyncAnthropic
+except ImportError:
+    AsyncAnthropic = None
+
+try:
+    import google.generativeai as genai
+except ImportError:
+    genai = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch the latter
+_json_loads = orjson.loads if orjson else json.loads
+
+try:
+    from prompts.jira_backlog_prompts import get_enhanced_prompt, get_static_prompt_prefix
 except ImportError:
     logger.warning("Could not import enhanced prompts, using fallback")
     get_enhanced_prompt = None
-    POSITION_SPECIFIC_PROMPTS = {}
+    get_static_prompt_prefix = None
+
+# System prompts shared by the providers
+ACTIVITY_SYSTEM_PROMPT = "You are a helpful assistant that generates professional daily activity descriptions for project management."
+STRUCTURED_SYSTEM_PROMPT = "You are a professional product manager and technical writer. Always respond with valid JSON only."
+
+# Fixed instructions for activity descriptions
+_BASE_INSTRUCTIONS = "\n".join([
+    "Generate a clear, professional activity description that:",
+    "- Is specific and actionable",
+    "- Uses professional language",
+    "- Includes relevant technical details if applicable",
+    "- Is suitable for project management tracking",
+    "- Is concise but informative"
+])
+
+# Position keywords (checked in order) and the instruction they add
+_POSITION_KEYWORDS = (
+    ('backend', "- Focuses on backend/server-side work (APIs, databases, services)"),
+    ('be', "- Focuses on backend/server-side work (APIs, databases, services)"),
+    ('frontend', "- Focuses on frontend/client-side work (UI, UX, components)"),
+    ('fe', "- Focuses on frontend/client-side work (UI, UX, components)"),
+    ('devops', "- Focuses on infrastructure, deployment, and operations"),
+    ('qa', "- Focuses on testing, quality assurance, and bug reporting"),
+    ('quality', "- Focuses on testing, quality assurance, and bug reporting"),
+    ('design', "- Focuses on design, user experience, and visual elements"),
+    ('ui', "- Focuses on design, user experience, and visual elements"),
+    ('mobile', "- Focuses on mobile development and platform-specific features"),
+)
+
+
+@lru_cache(maxsize=256)
+def _position_instruction(position: str) -> Optional[str]:
+    """Resolve a lowercased position to its extra instruction (positions come from a small fixed set)"""
+    return next((instruction for keyword, instruction in _POSITION_KEYWORDS if keyword in position), None)
+
+
+# Fallback task defaults: priority by task type and generic acceptance criteria
+_PRIORITY_MAP = MappingProxyType({
+    "bug_fix": "High",
+    "feature": "Medium",
+    "improvement": "Medium",
+    "technical_debt": "Low",
+    "research": "Low"
+})
+_DEFAULT_ACCEPTANCE = (
+    "Task is completed successfully",
+    "Code is reviewed and tested",
+    "Documentation is updated if needed"
+)
+
+# Provider health tracking for routing
+_EMA_ALPHA = 0.2
+_MAX_ERROR_RATE = 0.3
+_FAILURE_COOLDOWN_SECONDS = 60.0
+_DEGRADED_COOLDOWN_FACTOR = 5  # Cooldown multiplier once err_rate exceeds _MAX_ERROR_RATE
+_LATENCY_TOLERANCE = 0.2  # Providers within 20% of the fastest are treated as equally fast
+
+# Retry policy for provider rate-limit (429) errors
+_RATE_LIMIT_ATTEMPTS = 3
+_RATE_LIMIT_BASE_WAIT = 1.0
+_RATE_LIMIT_MAX_WAIT = 10.0
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    """Recognize provider rate-limit errors without importing every SDK"""
+    if type(error).__name__ in ('RateLimitError', 'ResourceExhausted', 'TooManyRequests'):
+        return True
+    return getattr(error, 'status_code', None) == 429
+
+
+def _token_usage(response) -> Optional[int]:
+    """Total tokens billed for a response (OpenAI reports a total, Anthropic input and output)"""
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return None
+    total = getattr(usage, 'total_tokens', None)
+    if total is None:
+        total = usage.input_tokens + usage.output_tokens
+    return total
+
+
+def _strip_code_fence(text: str) -> str:
+    """Remove a surrounding markdown code fence (```json ... ```) from a model response"""
+    if text.startswith('```'):
+        text = text.removeprefix('```json').removeprefix('```').removesuffix('```').strip()
+    return text
+
+
+# Marks a prompt block as cacheable by Anthropic (everything up to and including the block)
+_ANTHROPIC_CACHE_CONTROL = {"type": "ephemeral"}
+_ANTHROPIC_CACHE_HEADERS = {"anthropic-beta": "prompt-caching-2024-07-31"}
 
 
 class AIService:
     """Base class for AI service integration"""
     
     def __init__(self):
-        # Check if API keys are properly configured (not placeholder values)
-        self.openai_available = (
-            bool(settings.openai_api_key) and 
-            settings.openai_api_key != "your_openai_api_key_here"
-        )
-        self.anthropic_available = (
-            bool(settings.anthropic_api_key) and 
-            settings.anthropic_api_key != "your_anthropic_api_key_here"
-        )
-        self.gemini_available = (
-            bool(settings.gemini_api_key) and 
-            settings.gemini_api_key.startswith("AIza")  # Valid Gemini key format
+        # Provider availability and routing come from settings, which are
+        # only read on the first request (see _configure)
+        self._configured = False
+        self._configure_lock = threading.Lock()
+        
+        # Provider dispatch tables: model-name prefixes and handlers
+        self._model_prefixes = (('gemini', 'gemini'), ('gpt', 'openai'), ('claude', 'anthropic'))
+        self._generators = {
+            'gemini': self._generate_with_gemini,
+            'openai': self._generate_with_openai,
+            'anthropic': self._generate_with_anthropic
+        }
+        self._structured_generators = {
+            'gemini': self._generate_structured_with_gemini,
+            'openai': self._generate_structured_with_openai,
+            'anthropic': self._generate_structured_with_anthropic
+        }
+        self._streamers = {
+            'gemini': self._stream_with_gemini,
+            'openai': self._stream_with_openai,
+            'anthropic': self._stream_with_anthropic
+        }
+        
+        # Rolling per-provider health used for routing and fallback
+        self._provider_stats = {
+            name: {'ema_latency': 0.0, 'err_rate': 0.0, 'last_fail_ts': float('-inf')}
+            for name in self._generators
+        }
+        
+        # Provider clients are created on first use and reused across requests
+        # so their HTTP connection pools (and TLS sessions) stay warm
+        self._openai_client = None
+        self._anthropic_client = None
+        self._gemini_models: Dict[str, Any] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._clients_loop = None
+    
+    def _configure(self):
+        """Check which providers are configured and set up routing, once"""
+        if self._configured:
+            return
+        with self._configure_lock:
+            if self._configured:
+                return
+            settings = get_settings()
+            
+            # Check if API keys are properly configured (not placeholder values)
+            self.openai_available = (
+                bool(settings.openai_api_key) and 
+                settings.openai_api_key != "your_openai_api_key_here"
+            )
+            self.anthropic_available = (
+                bool(settings.anthropic_api_key) and 
+                settings.anthropic_api_key != "your_anthropic_api_key_here"
+            )
+            self.gemini_available = (
+                bool(settings.gemini_api_key) and 
+                settings.gemini_api_key.startswith("AIza")  # Valid Gemini key format
+            )
+            
+            # Log provider availability
+            logger.info(
+                "AI Providers available - OpenAI: {}, Anthropic: {}, Gemini: {}",
+                self.openai_available, self.anthropic_available, self.gemini_available
+            )
+            
+            # Ensure at least one provider is available
+            if not any([self.openai_available, self.anthropic_available, self.gemini_available]):
+                logger.warning("No AI providers are properly configured!")
+            
+            # Preference order of the available providers
+            available = {
+                'gemini': self.gemini_available,
+                'openai': self.openai_available,
+                'anthropic': self.anthropic_available
+            }
+            self._available_providers = frozenset(name for name, ok in available.items() if ok)
+            self._provider_order = tuple(
+                dict.fromkeys(
+                    name for name in (settings.primary_ai_provider, 'gemini', 'openai', 'anthropic')
+                    if name in self._available_providers
+                )
+            )
+            
+            # The Gemini SDK keeps its API key in module state, so configure it once
+            if self.gemini_available:
+                if genai is not None:
+                    genai.configure(api_key=settings.gemini_api_key)
+                else:
+                    logger.warning("Google Generative AI package not installed")
+            
+            self._configured = True
+    
+    @cached_property
+    def _response_cache(self) -> PromptCache:
+        """Recent successful responses, keyed on the normalized request"""
+        settings = get_settings()
+        return PromptCache(
+            maxsize=settings.ai_cache_max_entries,
+            ttl=settings.ai_cache_ttl_seconds
         )
+    
+    def _route(self, model: Optional[str] = None) -> List[Tuple[str, Optional[str]]]:
+        """
+        Order the providers to try for a request
+        
+        A model name whose family (gemini/gpt/claude) has an available
+        provider goes first with that model; the remaining providers follow
+        with their default models, ordered by settings.ai_routing_mode.
+        Providers that failed recently are skipped unless nothing else is left.
+        
+        Returns:
+            List of (provider name, model to pass to it) tuples, best first
+        """
+        self._configure()
+        candidates = self._healthy_providers() or list(self._provider_order)
+        
+        route = []
+        if model:
+            for prefix, provider in self._model_prefixes:
+                if model.startswith(prefix) and provider in candidates:
+                    route.append((provider, model))
+                    candidates.remove(provider)
+                    break
+        
+        route.extend((provider, None) for provider in self._rank_providers(candidates))
+        return route
+    
+    def _healthy_providers(self) -> List[str]:
+        """Available providers that are not cooling down after a recent failure"""
+        now = time.monotonic()
+        healthy = []
+        for provider in self._provider_order:
+            stats = self._provider_stats[provider]
+            # Frequently failing providers sit out longer before they get another try
+            cooldown = _FAILURE_COOLDOWN_SECONDS
+            if stats['err_rate'] > _MAX_ERROR_RATE:
+                cooldown *= _DEGRADED_COOLDOWN_FACTOR
+            if now - stats['last_fail_ts'] >= cooldown:
+                healthy.append(provider)
+        return healthy
+    
+    def _rank_providers(self, providers: List[str]) -> List[str]:
+        """Order providers by the configured routing mode (preference order breaks ties)"""
+        mode = get_settings().ai_routing_mode
+        if mode == 'latency' and providers:
+            ranked = sorted(providers, key=lambda p: self._provider_stats[p]['ema_latency'])
+            # Spread load randomly across providers that are about as fast as the best one
+            best = self._provider_stats[ranked[0]]['ema_latency']
+            near_best = [p for p in ranked if self._provider_stats[p]['ema_latency'] <= best * (1 + _LATENCY_TOLERANCE)]
+            random.shuffle(near_best)
+            return near_best + ranked[len(near_best):]
+        if mode == 'cost':
+            costs = get_settings().provider_cost_per_1k
+            return sorted(providers, key=lambda p: costs.get(p, 0.0))
+        return list(providers)
+    
+    def _record_success(self, provider: str, latency: float):
+        stats = self._provider_stats[provider]
+        if stats['ema_latency']:
+            stats['ema_latency'] += _EMA_ALPHA * (latency - stats['ema_latency'])
+        else:
+            stats['ema_latency'] = latency
+        stats['err_rate'] *= 1 - _EMA_ALPHA
+    
+    def _record_failure(self, provider: str):
+        stats = self._provider_stats[provider]
+        stats['err_rate'] += _EMA_ALPHA * (1.0 - stats['err_rate'])
+        stats['last_fail_ts'] = time.monotonic()
+    
+    async def _dispatch(self, handlers: Dict[str, Any], model: Optional[str], *args):
+        """
+        Call the best provider, falling back to the next one on failure
+        
+        Returns:
+            The provider's result, or None if no provider is available
+        
+        Raises:
+            The last provider error if every provider failed
+        """
+        last_error = None
+        for provider, provider_model in self._route(model):
+            started = time.monotonic()
+            try:
+                result = await self._call_provider(provider, handlers[provider], *args, provider_model)
+            except Exception as e:
+                self._record_failure(provider)
+                logger.warning("Provider {} failed, trying next available provider: {}", provider, e)
+                last_error = e
+                continue
+            
+            self._record_success(provider, time.monotonic() - started)
+            return result
+        
+        if last_error is not None:
+            raise last_error
+        return None
+    
+    async def _call_provider(self, provider: str, handler, *args):
+        """
+        Call a provider handler under its concurrency limit
+        
+        Excess requests queue on the provider's semaphore instead of
+        fanning out into 429s; rate-limit errors are retried with
+        exponential backoff (the slot is released while waiting).
+        """
+        semaphore = self._get_semaphore(provider)
+        for attempt in range(_RATE_LIMIT_ATTEMPTS):
+            try:
+                async with semaphore:
+                    return await handler(*args)
+            except Exception as e:
+                if not _is_rate_limited(e) or attempt == _RATE_LIMIT_ATTEMPTS - 1:
+                    raise
+                delay = min(_RATE_LIMIT_MAX_WAIT, _RATE_LIMIT_BASE_WAIT * 2 ** attempt) + random.random()
+                logger.warning("Provider {} rate limited, retrying in {:.1f}s", provider, delay)
+                await asyncio.sleep(delay)
+    
+    def _get_semaphore(self, provider: str) -> asyncio.Semaphore:
+        """Get the concurrency limiter for a provider on the current event loop"""
+        self._bind_event_loop()
+        semaphore = self._semaphores.get(provider)
+        if semaphore is None:
+            limit = getattr(get_settings(), f"{provider}_max_concurrency")
+            semaphore = self._semaphores[provider] = asyncio.Semaphore(limit)
+        return semaphore
+    
+    async def _coalesce(self, key: str, call):
+        """
+        Share one provider call among concurrent identical requests
+        
+        The response cache only helps once the first response is stored;
+        requests with the same cache key that arrive while it is still in
+        flight await its result instead of making their own upstream call.
+        
+        Args:
+            key: Response cache key of the request
+            call: Zero-argument coroutine function making the provider call
+        """
+        self._bind_event_loop()
+        pending = self._inflight.get(key)
+        if pending is not None:
+            # Shielded so a cancelled waiter does not cancel the shared call
+            return await asyncio.shield(pending)
+        
+        pending = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            pending.exception()  # mark retrieved in case nobody else was waiting
+            raise
+        else:
+            pending.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+    
+    def _bind_event_loop(self):
+        """Drop loop-bound clients when called from a different event loop"""
+        loop = asyncio.get_running_loop()
+        if self._clients_loop is not loop:
+            # Async connections cannot be reused across loops; the old ones are garbage collected
+            self._clients_loop = loop
+            self._openai_client = None
+            self._anthropic_client = None
+            self._gemini_models = {}
+            self._semaphores = {}
+            self._inflight = {}
+    
+    def _get_openai_client(self):
+        """Get the shared OpenAI client, creating it on first use"""
+        self._bind_event_loop()
+        if self._openai_client is None:
+            if AsyncOpenAI is None:
+                raise Exception("OpenAI package not installed")
+            
+            self._openai_client = AsyncOpenAI(
+                api_key=get_settings().openai_api_key,
+                timeout=30.0,
+                http_client=httpx.AsyncClient(limits=httpx.Limits(max_keepalive_connections=20))
+            )
+        return self._openai_client
+    
+    def _get_anthropic_client(self):
+        """Get the shared async Anthropic client, creating it on first use"""
+        self._bind_event_loop()
+        if self._anthropic_client is None:
+            if AsyncAnthropic is None:
+                raise Exception("Anthropic package not installed")
+            
+            self._anthropic_client = AsyncAnthropic(
+                api_key=get_settings().anthropic_api_key,
+                timeout=30.0
+            )
+        return self._anthropic_client
+    
+    def _get_gemini_model(self, model_name: str):
+        """Get the shared Gemini model instance for a model name, creating it on first use"""
+        self._bind_event_loop()
+        model_instance = self._gemini_models.get(model_name)
+        if model_instance is None:
+            if genai is None:
+                raise Exception("Google Generative AI package not installed")
+            model_instance = self._gemini_models[model_name] = genai.GenerativeModel(model_name)
+        return model_instance
+    
+    async def aclose(self):
+        """
+        Close the shared provider clients (call at application shutdown)
         
-        # Log provider availability
-        logger.info(f"AI Providers available - OpenAI: {self.openai_available}, Anthropic: {self.anthropic_available}, Gemini: {self.gemini_available}")
+        Clients created on another, already finished event loop cannot be
+        closed from here; they are only dropped.
+        """
+        if self._clients_loop is asyncio.get_running_loop():
+            if self._openai_client is not None:
+                await self._openai_client.close()
+            if self._anthropic_client is not None:
+                await self._anthropic_client.close()
         
-        # Ensure at least one provider is available
-        if not any([self.openai_available, self.anthropic_available, self.gemini_available]):
-            logger.warning("No AI providers are properly configured!")
+        self._openai_client = None
+        self._anthropic_client = None
+        self._gemini_models = {}
+        self._clients_loop = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
     
     async def generate_activity_description(
         self,
@@ -66,36 +497,74 @@ class AIService:
             Dict containing generated description and metadata
         """
         try:
-            # Determine which AI service to use based on primary provider or model specification
-            if model and model.startswith('gemini') and self.gemini_available:
-                return await self._generate_with_gemini(user_input, context, model)
-            elif model and model.startswith('gpt') and self.openai_available:
-                return await self._generate_with_openai(user_input, context, model)
-            elif model and model.startswith('claude') and self.anthropic_available:
-                return await self._generate_with_anthropic(user_input, context, model)
-            elif settings.primary_ai_provider == "gemini" and self.gemini_available:
-                return await self._generate_with_gemini(user_input, context)
-            elif settings.primary_ai_provider == "openai" and self.openai_available:
-                return await self._generate_with_openai(user_input, context)
-            elif settings.primary_ai_provider == "anthropic" and self.anthropic_available:
-                return await self._generate_with_anthropic(user_input, context)
-            elif self.gemini_available:
-                return await self._generate_with_gemini(user_input, context)
-            elif self.openai_available:
-                return await self._generate_with_openai(user_input, context)
-            elif self.anthropic_available:
-                return await self._generate_with_anthropic(user_input, context)
-            else:
+            # Serve repeated requests from the response cache
+            cache_key = PromptCache.make_key(
+                'activity', model or get_settings().primary_ai_provider, user_input, context
+            )
+            cached = self._response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+            
+            # Determine which AI service to use based on model specification and provider health
+            result = await self._coalesce(
+                cache_key, lambda: self._dispatch(self._generators, model, user_input, context)
+            )
+            if result is None:
                 return self._fallback_generation(user_input, context)
+            
+            if result.get('success'):
+                self._response_cache.set(cache_key, result)
+            return result
                 
         except Exception as e:
-            logger.error(f"AI generation failed: {str(e)}")
+            logger.error("AI generation failed: {}", e)
             return {
                 'success': False,
                 'error': str(e),
                 'fallback_description': self._fallback_generation(user_input, context)['description']
             }
 
+    async def agenerate_activity_description_stream(
+        self,
+        user_input: str,
+        context: Optional[Dict[str, Any]] = None,
+        model: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream an activity description as the provider generates it
+        
+        Providers are tried in routing order; a failing provider is only
+        skipped if it has not produced any text yet. Responses are not cached.
+        
+        Args:
+            user_input: User's brief description or keywords
+            context: Additional context (project, previous activities, etc.)
+            model: Specific AI model to use
+            
+        Yields:
+            Chunks of the description text (the fallback description if no provider is available)
+        """
+        for provider, provider_model in self._route(model):
+            started = time.monotonic()
+            streamed = False
+            try:
+                async with self._get_semaphore(provider):
+                    async for text in self._streamers[provider](user_input, context, provider_model):
+                        if text:
+                            streamed = True
+                            yield text
+            except Exception as e:
+                self._record_failure(provider)
+                if streamed:
+                    raise
+                logger.warning("Provider {} failed, trying next available provider: {}", provider, e)
+                continue
+            
+            self._record_success(provider, time.monotonic() - started)
+            return
+        
+        yield self._fallback_generation(user_input, context)['description']
+
     async def generate_task_backlog_item(
         self,
         user_input: str,
@@ -118,6 +587,13 @@ class AIService:
         try:
             # Use enhanced prompt if available
             if get_enhanced_prompt:
+                cache_key = PromptCache.make_key(
+                    'task', model or get_settings().primary_ai_provider, user_input, context, task_type
+                )
+                cached = self._response_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+                
                 position = context.get('user_position', '').lower() if context else ''
                 enhanced_prompt = get_enhanced_prompt(
                     user_input=user_input,
@@ -127,37 +603,24 @@ class AIService:
                 )
                 
                 # Generate with enhanced prompt
-                if model and model.startswith('gemini') and self.gemini_available:
-                    result = await self._generate_structured_with_gemini(enhanced_prompt, model)
-                elif model and model.startswith('gpt') and self.openai_available:
-                    result = await self._generate_structured_with_openai(enhanced_prompt, model)
-                elif model and model.startswith('claude') and self.anthropic_available:
-                    result = await self._generate_structured_with_anthropic(enhanced_prompt, model)
-                elif settings.primary_ai_provider == "gemini" and self.gemini_available:
-                    result = await self._generate_structured_with_gemini(enhanced_prompt)
-                elif settings.primary_ai_provider == "openai" and self.openai_available:
-                    result = await self._generate_structured_with_openai(enhanced_prompt)
-                elif settings.primary_ai_provider == "anthropic" and self.anthropic_available:
-                    result = await self._generate_structured_with_anthropic(enhanced_prompt)
-                elif self.gemini_available:
-                    result = await self._generate_structured_with_gemini(enhanced_prompt)
-                elif self.openai_available:
-                    result = await self._generate_structured_with_openai(enhanced_prompt)
-                elif self.anthropic_available:
-                    result = await self._generate_structured_with_anthropic(enhanced_prompt)
-                else:
+                result = await self._coalesce(
+                    cache_key, lambda: self._dispatch(self._structured_generators, model, enhanced_prompt)
+                )
+                if result is None:
                     return self._fallback_task_generation(user_input, context, task_type)
                 
                 # Parse JSON response
                 try:
-                    task_data = json.loads(result['description'])
-                    return {
+                    task_data = _json_loads(result['description'])
+                    task_result = {
                         'success': True,
                         'task_data': task_data,
                         'model_used': result.get('model_used'),
                         'provider': result.get('provider'),
                         'task_type': task_type
                     }
+                    self._response_cache.set(cache_key, task_result)
+                    return task_result
                 except json.JSONDecodeError:
                     logger.warning("Failed to parse JSON response, using fallback")
                     return self._fallback_task_generation(user_input, context, task_type)
@@ -166,13 +629,71 @@ class AIService:
                 return await self.generate_activity_description(user_input, context, model)
                 
         except Exception as e:
-            logger.error(f"Task backlog generation failed: {str(e)}")
+            logger.error("Task backlog generation failed: {}", e)
             return {
                 'success': False,
                 'error': str(e),
                 'fallback_task': self._fallback_task_generation(user_input, context, task_type)
             }
     
+    async def generate_activity_descriptions_batch(
+        self,
+        items: List[Tuple[str, Optional[Dict[str, Any]]]],
+        model: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate several activity descriptions concurrently
+        
+        Requests run in parallel, bounded by each provider's concurrency
+        limit; identical items share a single provider call.
+        
+        Args:
+            items: (user_input, context) tuples
+            model: Specific AI model to use for every item
+            
+        Returns:
+            One result per item, in the same order (see generate_activity_description)
+        """
+        # generate_activity_description reports its own errors, so nothing is raised here
+        return await asyncio.gather(
+            *(self.generate_activity_description(user_input, context, model)
+              for user_input, context in items)
+        )
+    
+    async def generate_task_backlog_items_batch(
+        self,
+        items: List[Tuple[str, Optional[Dict[str, Any]], str]],
+        model: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Generate several task backlog items concurrently
+        
+        Requests run in parallel, bounded by each provider's concurrency limit.
+        
+        Args:
+            items: (user_input, context, task_type) tuples
+            model: Specific AI model to use for every item
+            
+        Returns:
+            One result per item, in the same order (see generate_task_backlog_item)
+        """
+        results = await asyncio.gather(
+            *(self.generate_task_backlog_item(user_input, context, model, task_type)
+              for user_input, context, task_type in items),
+            return_exceptions=True
+        )
+        
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                user_input, context, task_type = items[index]
+                logger.error("Task backlog generation failed: {}", result)
+                results[index] = {
+                    'success': False,
+                    'error': str(result),
+                    'fallback_task': self._fallback_task_generation(user_input, context, task_type)
+                }
+        return results
+    
     async def _generate_with_openai(
         self,
         user_input: str,
@@ -181,20 +702,13 @@ class AIService:
     ) -> Dict[str, Any]:
         """Generate description using OpenAI API"""
         try:
+            settings = get_settings()
+            
             # Check if OpenAI is available
             if not settings.openai_api_key or settings.openai_api_key == "your_openai_api_key_here":
                 raise Exception("OpenAI API key not configured")
             
-            try:
-                from openai import AsyncOpenAI
-            except ImportError:
-                raise Exception("OpenAI package not installed")
-            
-            # Configure OpenAI client with minimal parameters
-            client = AsyncOpenAI(
-                api_key=settings.openai_api_key,
-                timeout=30.0
-            )
+            client = self._get_openai_client()
             model = model or settings.openai_model
             
             # Build prompt
@@ -204,7 +718,7 @@ class AIService:
             response = await client.chat.completions.create(
                 model=model,
                 messages=[
-                    {"role": "system", "content": "You are a helpful assistant that generates professional daily activity descriptions for project management."},
+                    {"role": "system", "content": ACTIVITY_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=settings.max_activity_length,
@@ -218,11 +732,11 @@ class AIService:
                 'description': description,
                 'model_used': model,
                 'provider': 'openai',
-                'token_usage': response.usage.total_tokens if hasattr(response, 'usage') else None
+                'token_usage': _token_usage(response)
             }
             
         except Exception as e:
-            logger.error(f"OpenAI API error: {str(e)}")
+            logger.error("OpenAI API error: {}", e)
             raise
     
     async def _generate_with_anthropic(
@@ -233,32 +747,32 @@ class AIService:
     ) -> Dict[str, Any]:
         """Generate description using Anthropic API"""
         try:
+            settings = get_settings()
+            
             # Check if Anthropic is available
             if not settings.anthropic_api_key or settings.anthropic_api_key == "your_anthropic_api_key_here":
                 raise Exception("Anthropic API key not configured")
             
-            try:
-                import anthropic
-            except ImportError:
-                raise Exception("Anthropic package not installed")
-            
-            # Configure Anthropic client with minimal parameters
-            client = anthropic.Anthropic(
-                api_key=settings.anthropic_api_key,
-                timeout=30.0
-            )
+            client = self._get_anthropic_client()
             model = model or settings.anthropic_model
             
-            # Build prompt
-            prompt = self._build_prompt(user_input, context)
+            # Static instructions go in cached system blocks; only the
+            # request-specific part is sent as the user message
+            position = context.get('user_position') if context else None
+            system = [
+                {"type": "text", "text": ACTIVITY_SYSTEM_PROMPT},
+                {"type": "text", "text": self._build_static_prefix(position), "cache_control": _ANTHROPIC_CACHE_CONTROL}
+            ]
             
             # Make API call
             response = await client.messages.create(
                 model=model,
                 max_tokens=settings.max_activity_length,
+                system=system,
                 messages=[
-                    {"role": "user", "content": prompt}
-                ]
+                    {"role": "user", "content": self._build_variable_suffix(user_input, context)}
+                ],
+                extra_headers=_ANTHROPIC_CACHE_HEADERS
             )
             
             description = response.content[0].text.strip()
@@ -268,16 +782,104 @@ class AIService:
                 'description': description,
                 'model_used': model,
                 'provider': 'anthropic',
-                'token_usage': response.usage.total_tokens if hasattr(response, 'usage') else None
+                'token_usage': _token_usage(response)
             }
             
         except Exception as e:
-            logger.error(f"Anthropic API error: {str(e)}")
+            logger.error("Anthropic API error: {}", e)
             raise
     
+    async def _stream_with_openai(
+        self,
+        user_input: str,
+        context: Optional[Dict[str, Any]] = None,
+        model: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream a description from the OpenAI API"""
+        settings = get_settings()
+        if not settings.openai_api_key or settings.openai_api_key == "your_openai_api_key_here":
+            raise Exception("OpenAI API key not configured")
+        
+        client = self._get_openai_client()
+        stream = await client.chat.completions.create(
+            model=model or settings.openai_model,
+            messages=[
+                {"role": "system", "content": ACTIVITY_SYSTEM_PROMPT},
+                {"role": "user", "content": self._build_prompt(user_input, context)}
+            ],
+            max_tokens=settings.max_activity_length,
+            temperature=0.7,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ''
+    
+    async def _stream_with_anthropic(
+        self,
+        user_input: str,
+        context: Optional[Dict[str, Any]] = None,
+        model: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream a description from the Anthropic API"""
+        settings = get_settings()
+        if not settings.anthropic_api_key or settings.anthropic_api_key == "your_anthropic_api_key_here":
+            raise Exception("Anthropic API key not configured")
+        
+        client = self._get_anthropic_client()
+        position = context.get('user_position') if context else None
+        system = [
+            {"type": "text", "text": ACTIVITY_SYSTEM_PROMPT},
+            {"type": "text", "text": self._build_static_prefix(position), "cache_control": _ANTHROPIC_CACHE_CONTROL}
+        ]
+        async with client.messages.stream(
+            model=model or settings.anthropic_model,
+            max_tokens=settings.max_activity_length,
+            system=system,
+            messages=[
+                {"role": "user", "content": self._build_variable_suffix(user_input, context)}
+            ],
+            extra_headers=_ANTHROPIC_CACHE_HEADERS
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+    
+    async def _stream_with_gemini(
+        self,
+        user_input: str,
+        context: Optional[Dict[str, Any]] = None,
+        model: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream a description from the Google Gemini API"""
+        model_instance = self._get_gemini_model(model or get_settings().gemini_model)
+        response = await model_instance.generate_content_async(
+            self._build_prompt(user_input, context),
+            stream=True
+        )
+        async for chunk in response:
+            yield chunk.text
+    
     def _build_prompt(self, user_input: str, context: Optional[Dict[str, Any]] = None) -> str:
         """Build the prompt for AI generation"""
-        prompt_parts = [settings.default_activity_prompt]
+        position = context.get('user_position') if context else None
+        return self._build_static_prefix(position) + "\n\n" + self._build_variable_suffix(user_input, context)
+    
+    def _build_static_prefix(self, position: Optional[str] = None) -> str:
+        """Build the instruction part of the prompt, which only depends on the user's position"""
+        instructions = _BASE_INSTRUCTIONS
+        
+        # Add position-specific instructions
+        if position:
+            position = position.lower()
+            extra = _position_instruction(position)
+            if extra:
+                instructions = instructions + "\n" + extra
+        
+        return instructions + "\n\n" + get_settings().default_activity_prompt
+    
+    def _build_variable_suffix(self, user_input: str, context: Optional[Dict[str, Any]] = None) -> str:
+        """Build the request-specific part of the prompt (context and user input)"""
+        prompt_parts = []
         
         # Add context if available
         if context:
@@ -293,36 +895,24 @@ class AIService:
         # Add user input
         prompt_parts.append(f"User input: {user_input}")
         
-        # Add instructions with position-specific guidance
-        instructions = [
-            "\nGenerate a clear, professional activity description that:",
-            "- Is specific and actionable",
-            "- Uses professional language",
-            "- Includes relevant technical details if applicable",
-            "- Is suitable for project management tracking",
-            "- Is concise but informative"
-        ]
-        
-        # Add position-specific instructions
-        if context and context.get('user_position'):
-            position = context['user_position'].lower()
-            if 'backend' in position or 'be' in position:
-                instructions.append("- Focuses on backend/server-side work (APIs, databases, services)")
-            elif 'frontend' in position or 'fe' in position:
-                instructions.append("- Focuses on frontend/client-side work (UI, UX, components)")
-            elif 'devops' in position:
-                instructions.append("- Focuses on infrastructure, deployment, and operations")
-            elif 'qa' in position or 'quality' in position:
-                instructions.append("- Focuses on testing, quality assurance, and bug reporting")
-            elif 'design' in position or 'ui' in position:
-                instructions.append("- Focuses on design, user experience, and visual elements")
-            elif 'mobile' in position:
-                instructions.append("- Focuses on mobile development and platform-specific features")
-        
-        prompt_parts.append("\n".join(instructions))
-        
         return "\n\n".join(prompt_parts)
     
+    def _split_cacheable_prompt(self, prompt: str):
+        """
+        Split an enhanced prompt into Anthropic content blocks
+        
+        The static prefix shared by all enhanced prompts is marked cacheable;
+        the rest is sent as a plain block. Prompts without the prefix are
+        returned unchanged.
+        """
+        prefix = get_static_prompt_prefix() if get_static_prompt_prefix else None
+        if not prefix or not prompt.startswith(prefix):
+            return prompt
+        return [
+            {"type": "text", "text": prefix, "cache_control": _ANTHROPIC_CACHE_CONTROL},
+            {"type": "text", "text": prompt[len(prefix):]}
+        ]
+    
     async def _generate_with_gemini(
         self,
         user_input: str,
@@ -331,23 +921,14 @@ class AIService:
     ) -> Dict[str, Any]:
         """Generate description using Google Gemini API"""
         try:
-            import google.generativeai as genai
-            
-            # Configure Gemini
-            genai.configure(api_key=settings.gemini_api_key)
-            model_name = model or settings.gemini_model
-            
-            # Create model instance
-            model_instance = genai.GenerativeModel(model_name)
+            model_name = model or get_settings().gemini_model
+            model_instance = self._get_gemini_model(model_name)
             
             # Build prompt
             prompt = self._build_prompt(user_input, context)
             
             # Make API call
-            response = await asyncio.to_thread(
-                model_instance.generate_content,
-                prompt
-            )
+            response = await model_instance.generate_content_async(prompt)
             
             description = response.text.strip()
             
@@ -360,36 +941,24 @@ class AIService:
             }
             
         except Exception as e:
-            logger.error(f"Gemini API error: {str(e)}")
+            logger.error("Gemini API error: {}", e)
             raise
 
     async def _generate_structured_with_gemini(self, prompt: str, model: Optional[str] = None) -> Dict[str, Any]:
         """Generate structured response using Google Gemini API"""
         try:
-            import google.generativeai as genai
-            
-            # Configure Gemini
-            genai.configure(api_key=settings.gemini_api_key)
-            model_name = model or settings.gemini_model
-            
-            # Create model instance
-            model_instance = genai.GenerativeModel(model_name)
+            model_name = model or get_settings().gemini_model
+            model_instance = self._get_gemini_model(model_name)
             
             # Make API call with JSON instruction
             full_prompt = f"{prompt}\n\nPlease respond with valid JSON only, no additional text or markdown formatting."
             
-            response = await asyncio.to_thread(
-                model_instance.generate_content,
-                full_prompt
-            )
+            response = await model_instance.generate_content_async(full_prompt)
             
             description = response.text.strip()
             
             # Clean up response if it has markdown formatting
-            if description.startswith('```json'):
-                description = description.replace('```json', '').replace('```', '').strip()
-            elif description.startswith('```'):
-                description = description.replace('```', '').strip()
+            description = _strip_code_fence(description)
             
             return {
                 'success': True,
@@ -400,7 +969,7 @@ class AIService:
             }
             
         except Exception as e:
-            logger.error(f"Gemini structured API error: {str(e)}")
+            logger.error("Gemini structured API error: {}", e)
             raise
     
     def _fallback_generation(self, user_input: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
@@ -426,23 +995,14 @@ class AIService:
             if not self.openai_available:
                 raise Exception("OpenAI API not configured or available")
             
-            try:
-                from openai import AsyncOpenAI
-            except ImportError:
-                raise Exception("OpenAI package not installed")
-            
-            # Configure OpenAI client with minimal parameters
-            client = AsyncOpenAI(
-                api_key=settings.openai_api_key,
-                timeout=30.0
-            )
-            model = model or settings.openai_model
+            client = self._get_openai_client()
+            model = model or get_settings().openai_model
             
             # Make API call
             response = await client.chat.completions.create(
                 model=model,
                 messages=[
-                    {"role": "system", "content": "You are a professional product manager and technical writer. Always respond with valid JSON only."},
+                    {"role": "system", "content": STRUCTURED_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=1500,
@@ -456,11 +1016,11 @@ class AIService:
                 'description': description,
                 'model_used': model,
                 'provider': 'openai',
-                'token_usage': response.usage.total_tokens if hasattr(response, 'usage') else None
+                'token_usage': _token_usage(response)
             }
             
         except Exception as e:
-            logger.error(f"OpenAI structured API error: {str(e)}")
+            logger.error("OpenAI structured API error: {}", e)
             raise
 
     async def _generate_structured_with_anthropic(self, prompt: str, model: Optional[str] = None) -> Dict[str, Any]:
@@ -470,26 +1030,19 @@ class AIService:
             if not self.anthropic_available:
                 raise Exception("Anthropic API not configured or available")
             
-            try:
-                import anthropic
-            except ImportError:
-                raise Exception("Anthropic package not installed")
-            
-            # Configure Anthropic client with minimal parameters
-            client = anthropic.Anthropic(
-                api_key=settings.anthropic_api_key,
-                timeout=30.0
-            )
-            model = model or settings.anthropic_model
+            client = self._get_anthropic_client()
+            model = model or get_settings().anthropic_model
             
             # Make API call
             response = await client.messages.create(
                 model=model,
                 max_tokens=1500,
                 temperature=0.3,  # Lower temperature for more structured output
+                system=STRUCTURED_SYSTEM_PROMPT,
                 messages=[
-                    {"role": "user", "content": prompt}
-                ]
+                    {"role": "user", "content": self._split_cacheable_prompt(prompt)}
+                ],
+                extra_headers=_ANTHROPIC_CACHE_HEADERS
             )
             
             description = response.content[0].text.strip()
@@ -499,36 +1052,23 @@ class AIService:
                 'description': description,
                 'model_used': model,
                 'provider': 'anthropic',
-                'token_usage': response.usage.total_tokens if hasattr(response, 'usage') else None
+                'token_usage': _token_usage(response)
             }
             
         except Exception as e:
-            logger.error(f"Anthropic structured API error: {str(e)}")
+            logger.error("Anthropic structured API error: {}", e)
             raise
 
     def _fallback_task_generation(self, user_input: str, context: Optional[Dict[str, Any]] = None, task_type: str = "feature") -> Dict[str, Any]:
         """Fallback task generation when AI services are not available"""
         
-        # Determine priority based on task type
-        priority_map = {
-            "bug_fix": "High",
-            "feature": "Medium", 
-            "improvement": "Medium",
-            "technical_debt": "Low",
-            "research": "Low"
-        }
-        
         # Basic task structure
         task_data = {
             "title": f"{task_type.replace('_', ' ').title()}: {user_input}",
             "description": f"Task: {user_input}\n\nThis task was generated using fallback mode. Please review and enhance the description with more details.",
-            "acceptance_criteria": [
-                "Task is completed successfully",
-                "Code is reviewed and tested",
-                "Documentation is updated if needed"
-            ],
+            "acceptance_criteria": list(_DEFAULT_ACCEPTANCE),
             "story_points": "3",
-            "priority": priority_map.get(task_type, "Medium"),
+            "priority": _PRIORITY_MAP.get(task_type, "Medium"),
             "labels": [task_type.replace('_', '-'), "fallback"],
             "component": context.get('project_name', 'General') if context else 'General'
         }
@@ -0,0 +1,92 @@
+"""
+Response cache for AI generation
+Keeps recent provider responses in-process so repeated prompts skip the LLM round-trip
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback
+    orjson = None
+
+
+def _dumps_sorted(obj: Any) -> bytes:
+    """Serialize to JSON with sorted keys (used for cache keys only)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+    return json.dumps(obj, sort_keys=True, default=str).encode()
+
+
+class PromptCache:
+    """Thread-safe LRU cache with a per-entry time-to-live"""
+
+    def __init__(self, maxsize: int = 4096, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    @staticmethod
+    def make_key(
+        kind: str,
+        model: Optional[str],
+        user_input: str,
+        context: Optional[Dict[str, Any]] = None,
+        task_type: str = ""
+    ) -> str:
+        """
+        Build a stable cache key for a generation request
+
+        The user input is whitespace- and case-normalized so trivially
+        different spellings of the same request share an entry.
+        """
+        normalized_input = " ".join(user_input.split()).casefold()
+        raw = "|".join((kind, model or "", normalized_input, task_type)).encode()
+        return hashlib.blake2b(raw + b"|" + _dumps_sorted(context or {}), digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached response, or None if missing or expired"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return dict(value)
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """Store a response, evicting the least recently used entries if full"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached responses"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -3,12 +3,42 @@ Taiga API integration for Written chatbot
 Handles communication with Taiga project management platform
 """
 
-import requests
-from typing import Optional, Dict, List, Any
+import asyncio
+import aiohttp
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, List, Any, AsyncIterator
 from datetime import datetime, date
-from config.settings import settings
+from config.settings import get_settings
 from loguru import logger
 
+try:
+    import ijson
+except ImportError:  # list endpoints are parsed in one go instead
+    ijson = None
+
+
+# Retry policy for throttled (429) and temporarily unavailable Taiga responses
+_RETRY_ATTEMPTS = 5
+_RETRY_MAX_WAIT = 60.0
+_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# Statuses that guarantee a write was not applied, so POSTs can be retried safely
+_WRITE_RETRY_STATUSES = frozenset({429, 503})
+
+# How long a successful authentication is trusted before it is checked again
+_AUTH_TTL_SECONDS = 55 * 60
+
+
+def _retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before the next attempt, honoring a Retry-After header in seconds"""
+    if retry_after:
+        try:
+            return min(_RETRY_MAX_WAIT, float(retry_after))
+        except ValueError:
+            pass  # HTTP-date form; fall back to exponential backoff
+    return min(_RETRY_MAX_WAIT, 2 ** attempt) + random.random()
+
 
 class TaigaAPIError(Exception):
     """Custom exception for Taiga API errors"""
@@ -19,25 +49,177 @@ class TaigaAPI:
     """Taiga API client for project management integration"""
     
     def __init__(self):
-        self.base_url = settings.taiga_base_url
         self.auth_token = None
-        self.session = requests.Session()
+        self.headers = {'Content-Type': 'application/json'}
+        
+        # The HTTP session is created on first use and reused so connections stay alive
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._auth_lock: Optional[asyncio.Lock] = None
+        self._auth_expiry = 0.0
+        self._session_loop = None
+        
+        # Project metadata: cache key -> (expires at, ETag, data)
+        self._project_cache: Dict[Any, tuple] = {}
+    
+    @property
+    def base_url(self) -> str:
+        """Taiga API root URL from settings"""
+        return get_settings().taiga_base_url
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared HTTP session for the current event loop, creating it on first use"""
+        loop = asyncio.get_running_loop()
+        if self._session_loop is not loop:
+            # Sessions cannot be reused across loops; the old one belongs to a finished loop
+            self._session_loop = loop
+            self._session = None
+            self._semaphore = asyncio.Semaphore(get_settings().taiga_max_concurrency)
+            self._auth_lock = asyncio.Lock()
+        
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=64, limit_per_host=16, keepalive_timeout=75),
+                timeout=aiohttp.ClientTimeout(total=30)
+            )
+        return self._session
+    
+    @asynccontextmanager
+    async def _response(self, method: str, path: str, headers: Optional[Dict[str, str]] = None, **kwargs):
+        """
+        Open a response from the Taiga API
+        
+        Throttled and temporarily unavailable responses and connection errors
+        are retried with exponential backoff; writes are only retried when
+        Taiga cannot have applied them. The concurrency slot is released
+        while waiting, and held while the caller reads the response.
+        
+        Yields:
+            The aiohttp response (final status, body not yet read)
+        """
+        session = self._get_session()
+        url = f"{self.base_url}{path}"
+        headers = {**self.headers, **headers} if headers else self.headers
+        retry_statuses = _RETRY_STATUSES if method == 'GET' else _WRITE_RETRY_STATUSES
+        
+        for attempt in range(_RETRY_ATTEMPTS):
+            last_attempt = attempt == _RETRY_ATTEMPTS - 1
+            opened = False
+            try:
+                async with self._semaphore:
+                    async with session.request(method, url, headers=headers, **kwargs) as response:
+                        if response.status == 401:
+                            # Token expired or revoked; authenticate again on the next call
+                            self._auth_expiry = 0.0
+                        if response.status not in retry_statuses or last_attempt:
+                            opened = True
+                            yield response
+                            return
+                        delay = _retry_delay(attempt, response.headers.get('Retry-After'))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                # Failures while the caller reads the body are not retried here
+                if opened:
+                    raise
+                # Unless the connection was never established, a write may already have reached Taiga
+                if last_attempt or (method != 'GET' and not isinstance(e, aiohttp.ClientConnectorError)):
+                    raise
+                delay = _retry_delay(attempt)
+                logger.warning(f"Taiga {method} {path} failed ({e}), retrying in {delay:.1f}s")
+            else:
+                logger.warning(f"Taiga {method} {path} returned {response.status}, retrying in {delay:.1f}s")
+            
+            await asyncio.sleep(delay)
+    
+    async def _request(self, method: str, path: str, **kwargs) -> tuple:
+        """
+        Send a request to the Taiga API (retried as described in _response)
+        
+        Returns:
+            Tuple of (status code, parsed JSON body or response text)
+        """
+        async with self._response(method, path, **kwargs) as response:
+            if response.status in (200, 201):
+                return response.status, await response.json(content_type=None)
+            return response.status, await response.text()
+    
+    async def _get_project_data(self, cache_key: Any, path: str) -> tuple:
+        """
+        GET project metadata, served from cache while fresh
+        
+        Stale entries are revalidated with their ETag; a 304 response
+        renews the entry without downloading or parsing the body again.
+        
+        Returns:
+            Tuple of (status code, data or None)
+        """
+        ttl = get_settings().taiga_project_cache_ttl_seconds
+        entry = self._project_cache.get(cache_key)
+        if entry is not None and time.monotonic() < entry[0]:
+            return 200, entry[2]
+        
+        headers = {'If-None-Match': entry[1]} if entry is not None and entry[1] else None
+        async with self._response('GET', path, headers=headers) as response:
+            if response.status == 304 and entry is not None:
+                data = entry[2]
+            elif response.status == 200:
+                data = await response.json(content_type=None)
+            else:
+                return response.status, None
+            
+            if ttl > 0:
+                self._project_cache[cache_key] = (time.monotonic() + ttl, response.headers.get('ETag'), data)
+            return 200, data
+    
+    def invalidate_project(self, project_id: Optional[int] = None):
+        """
+        Drop cached project metadata
+        
+        Args:
+            project_id: Project to drop (along with the project list); None drops everything
+        """
+        if project_id is None:
+            self._project_cache.clear()
+        else:
+            self._project_cache.pop(project_id, None)
+            self._project_cache.pop('projects', None)
+    
+    async def close(self):
+        """Close the HTTP session (call before the event loop it was used on is closed)"""
+        if self._session is not None and self._session_loop is asyncio.get_running_loop():
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
         
     async def authenticate(self) -> bool:
         """
         Authenticate with Taiga API
         
+        Concurrent callers share a single authentication, and a successful
+        one is reused for _AUTH_TTL_SECONDS, so calling this before every
+        request is cheap.
+        
         Returns:
             bool: True if authentication successful
         """
+        self._get_session()
+        async with self._auth_lock:
+            if self.auth_token and time.monotonic() < self._auth_expiry:
+                return True
+            
+            authenticated = await self._authenticate()
+            if authenticated:
+                self._auth_expiry = time.monotonic() + _AUTH_TTL_SECONDS
+            return authenticated
+    
+    async def _authenticate(self) -> bool:
+        """Run the authentication flow for the configured credentials"""
         try:
+            settings = get_settings()
+            
             # Use token if available
             if settings.taiga_auth_token:
                 self.auth_token = settings.taiga_auth_token
-                self.session.headers.update({
-                    'Authorization': f'Bearer {self.auth_token}',
-                    'Content-Type': 'application/json'
-                })
+                self.headers['Authorization'] = f'Bearer {self.auth_token}'
                 return await self._verify_token()
             
             # Use username/password authentication
@@ -54,54 +236,48 @@ class TaigaAPI:
     
     async def _authenticate_with_credentials(self) -> bool:
         """Authenticate using username and password"""
-        auth_url = f"{self.base_url}/api/v1/auth"
-        
+        settings = get_settings()
         payload = {
             "username": settings.taiga_username,
             "password": settings.taiga_password,
             "type": "normal"
         }
         
-        response = self.session.post(auth_url, json=payload)
+        status, auth_data = await self._request('POST', '/api/v1/auth', json=payload)
         
-        if response.status_code == 200:
-            auth_data = response.json()
+        if status == 200:
             self.auth_token = auth_data.get('auth_token')
-            
-            self.session.headers.update({
-                'Authorization': f'Bearer {self.auth_token}',
-                'Content-Type': 'application/json'
-            })
+            self.headers['Authorization'] = f'Bearer {self.auth_token}'
             
             logger.info("Successfully authenticated with Taiga")
             return True
         else:
-            logger.error(f"Taiga authentication failed: {response.status_code} - {response.text}")
+            logger.error(f"Taiga authentication failed: {status} - {auth_data}")
             return False
     
     async def _verify_token(self) -> bool:
         """Verify the current auth token is valid"""
         try:
-            response = self.session.get(f"{self.base_url}/api/v1/users/me")
-            return response.status_code == 200
+            status, _ = await self._request('GET', '/api/v1/users/me')
+            return status == 200
         except Exception as e:
             logger.error(f"Token verification failed: {str(e)}")
             return False
     
     async def get_user_projects(self) -> List[Dict[str, Any]]:
         """
-        Get list of projects for the authenticated user
+        Get list of projects for the authenticated user (cached, see _get_project_data)
         
         Returns:
             List of project dictionaries
         """
         try:
-            response = self.session.get(f"{self.base_url}/api/v1/projects")
+            status, data = await self._get_project_data('projects', '/api/v1/projects')
             
-            if response.status_code == 200:
-                return response.json()
+            if status == 200:
+                return data
             else:
-                raise TaigaAPIError(f"Failed to fetch projects: {response.status_code}")
+                raise TaigaAPIError(f"Failed to fetch projects: {status}")
                 
         except Exception as e:
             logger.error(f"Error fetching user projects: {str(e)}")
@@ -109,7 +285,7 @@ class TaigaAPI:
     
     async def get_project_details(self, project_id: int) -> Dict[str, Any]:
         """
-        Get detailed information about a specific project
+        Get detailed information about a specific project (cached, see _get_project_data)
         
         Args:
             project_id: Taiga project ID
@@ -118,12 +294,12 @@ class TaigaAPI:
             Project details dictionary
         """
         try:
-            response = self.session.get(f"{self.base_url}/api/v1/projects/{project_id}")
+            status, data = await self._get_project_data(project_id, f'/api/v1/projects/{project_id}')
             
-            if response.status_code == 200:
-                return response.json()
+            if status == 200:
+                return data
             else:
-                raise TaigaAPIError(f"Failed to fetch project details: {response.status_code}")
+                raise TaigaAPIError(f"Failed to fetch project details: {status}")
                 
         except Exception as e:
             logger.error(f"Error fetching project details: {str(e)}")
@@ -165,13 +341,9 @@ class TaigaAPI:
                 payload['user'] = user_id
             
             # Submit to Taiga time tracking endpoint
-            response = self.session.post(
-                f"{self.base_url}/api/v1/time-entries",
-                json=payload
-            )
+            status, result = await self._request('POST', '/api/v1/time-entries', json=payload)
             
-            if response.status_code in [200, 201]:
-                result = response.json()
+            if status in [200, 201]:
                 logger.info(f"Successfully submitted activity to Taiga: {result.get('id')}")
                 return {
                     'success': True,
@@ -179,12 +351,12 @@ class TaigaAPI:
                     'data': result
                 }
             else:
-                error_msg = f"Failed to submit activity: {response.status_code} - {response.text}"
+                error_msg = f"Failed to submit activity: {status} - {result}"
                 logger.error(error_msg)
                 return {
                     'success': False,
                     'error': error_msg,
-                    'status_code': response.status_code
+                    'status_code': status
                 }
                 
         except Exception as e:
@@ -195,22 +367,40 @@ class TaigaAPI:
                 'error': error_msg
             }
     
-    async def get_user_activities(
+    async def submit_activities(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Submit several activities/time entries to Taiga concurrently
+        
+        Requests overlap up to the client's concurrency limit.
+        
+        Args:
+            entries: Dictionaries with the submit_activity arguments
+                (project_id, description, hours, activity_date and optional user_id)
+            
+        Returns:
+            One submission result per entry, in the same order (see submit_activity)
+        """
+        return list(await asyncio.gather(*(self.submit_activity(**entry) for entry in entries)))
+    
+    async def iter_user_activities(
         self,
         project_id: Optional[int] = None,
         start_date: Optional[date] = None,
         end_date: Optional[date] = None
-    ) -> List[Dict[str, Any]]:
+    ) -> AsyncIterator[Dict[str, Any]]:
         """
-        Get user's activities/time entries from Taiga
+        Stream user's activities/time entries from Taiga
+        
+        Entries are parsed incrementally as the response arrives (when ijson
+        is installed), so large histories are never held in memory at once.
         
         Args:
             project_id: Optional project ID filter
             start_date: Optional start date filter
             end_date: Optional end date filter
             
-        Returns:
-            List of activity dictionaries
+        Yields:
+            Activity dictionaries
         """
         try:
             params = {}
@@ -222,19 +412,39 @@ class TaigaAPI:
             if end_date:
                 params['date__lte'] = end_date.strftime('%Y-%m-%d')
             
-            response = self.session.get(
-                f"{self.base_url}/api/v1/time-entries",
-                params=params
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise TaigaAPIError(f"Failed to fetch activities: {response.status_code}")
+            async with self._response('GET', '/api/v1/time-entries', params=params) as response:
+                if response.status != 200:
+                    raise TaigaAPIError(f"Failed to fetch activities: {response.status}")
+                
+                if ijson is not None:
+                    async for activity in ijson.items(response.content, 'item', use_float=True):
+                        yield activity
+                else:
+                    for activity in await response.json(content_type=None):
+                        yield activity
                 
         except Exception as e:
             logger.error(f"Error fetching user activities: {str(e)}")
             raise TaigaAPIError(str(e))
+    
+    async def get_user_activities(
+        self,
+        project_id: Optional[int] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get user's activities/time entries from Taiga
+        
+        Args:
+            project_id: Optional project ID filter
+            start_date: Optional start date filter
+            end_date: Optional end date filter
+            
+        Returns:
+            List of activity dictionaries
+        """
+        return [activity async for activity in self.iter_user_activities(project_id, start_date, end_date)]
 
 
 # Global Taiga API instance
@@ -0,0 +1,61 @@
+"""
+Sync-to-async bridge for Written AI Chatbot
+Runs one persistent asyncio event loop in a daemon thread so request handlers
+can await the async AI/Taiga clients without building a loop per request; the
+clients are bound to this loop, so their connection pools stay warm between requests
+"""
+
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Coroutine, Iterator, Optional
+
+try:
+    import uvloop
+except ImportError:  # optional, the stdlib loop works the same way
+    uvloop = None
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the shared background loop, starting its thread on first use"""
+    global _loop
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="async-bridge", daemon=True
+                ).start()
+                _loop = loop
+    return _loop
+
+
+def is_started() -> bool:
+    """Check whether the shared loop has been started"""
+    return _loop is not None
+
+
+def run_async(coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the shared loop and block until it returns"""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result(timeout)
+
+
+def iter_async(iterator: AsyncIterator[Any], timeout: Optional[float] = None) -> Iterator[Any]:
+    """
+    Iterate an async iterator from sync code, pulling each item on the shared loop
+
+    Closing the returned generator early (e.g. a client disconnecting from a
+    streamed response) closes the async iterator too.
+    """
+    try:
+        while True:
+            try:
+                yield run_async(iterator.__anext__(), timeout)
+            except StopAsyncIteration:
+                return
+    finally:
+        aclose = getattr(iterator, 'aclose', None)
+        if aclose is not None:
+            run_async(aclose(), timeout)
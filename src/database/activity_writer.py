@@ -0,0 +1,165 @@
+"""
+Background persistence of activities for Written AI Chatbot
+Batches local Activity inserts on a worker thread, off the request path
+"""
+
+import atexit
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import String, and_, bindparam, case, insert, not_, select
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError
+from loguru import logger
+
+from src.database.models import db, Activity, User, UserPosition
+
+_STOP = object()
+
+
+def _build_insert():
+    """
+    INSERT for one activity that prefixes its title in SQL
+
+    The user's position prefix is looked up inline, so titles get the same
+    "[PREFIX] " treatment as User.format_activity_title without a separate
+    SELECT of the user.
+    """
+    title = bindparam('title_text', type_=String)
+    prefix = (
+        select(UserPosition.position_prefix)
+        .join(User, User.position_id == UserPosition.id)
+        .where(User.id == bindparam('title_user_id'))
+        .scalar_subquery()
+    )
+    return insert(Activity).values(title=case(
+        (and_(prefix.is_not(None), not_(title.startswith('['))), '[' + prefix + '] ' + title),
+        else_=title
+    ))
+
+
+_INSERT_ACTIVITY = _build_insert()
+
+
+class ActivityWriter:
+    """Queue of Activity rows written to the database from a single worker thread"""
+
+    def __init__(self, batch_size: int = 50, flush_interval: float = 0.1):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue" = queue.Queue()
+        self._app = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+
+    def init_app(self, app):
+        """Bind the writer to the Flask app whose database it writes to"""
+        self._app = app
+        # Write out whatever is still queued when the process exits (one hook
+        # however many apps are created)
+        if not self._atexit_registered:
+            atexit.register(self.close)
+            self._atexit_registered = True
+
+    def submit(self, values: Dict[str, Any]):
+        """
+        Queue an activity for insertion
+
+        Args:
+            values: Activity column values (as passed to Activity(...)); the
+                title is stored with the user's position prefix
+        """
+        if self._app is None:
+            raise RuntimeError("ActivityWriter is not bound to an app; call init_app first")
+        self._ensure_started()
+        self._queue.put(values)
+
+    def close(self, timeout: float = 5.0):
+        """Flush queued activities and stop the worker thread"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    thread = threading.Thread(target=self._run, name="activity-writer", daemon=True)
+                    thread.start()
+                    self._thread = thread
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            if batch[0] is _STOP:
+                break
+
+            # Collect whatever else arrives within the flush interval, up to a full batch
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        params = []
+        for values in batch:
+            values = dict(values)
+            values['title_text'] = values.pop('title')
+            values['title_user_id'] = values['user_id']
+            params.append(values)
+
+        with self._app.app_context():
+            try:
+                self._insert(params)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Failed to store {len(batch)} activities: {str(e)}")
+
+    def _insert(self, params: List[Dict[str, Any]]):
+        try:
+            db.session.execute(_INSERT_ACTIVITY, params)
+            db.session.commit()
+            return
+        except (IntegrityError, DataError) as e:
+            db.session.rollback()
+            if len(params) == 1:
+                self._log_dropped(params[0], e)
+                return
+            # One bad row (e.g. an unknown user_id) must not cost the rest of the batch
+            logger.warning(f"Batch insert of {len(params)} activities failed, retrying one by one: {str(e.orig)}")
+
+        for row in params:
+            try:
+                db.session.execute(_INSERT_ACTIVITY, row)
+                db.session.commit()
+            except (IntegrityError, DataError) as e:
+                db.session.rollback()
+                self._log_dropped(row, e)
+
+    @staticmethod
+    def _log_dropped(row: Dict[str, Any], error: DBAPIError):
+        logger.error(
+            f"Dropped activity for user {row.get('user_id')} "
+            f"({row.get('title_text')!r}): {str(error.orig)}"
+        )
+
+
+# Global activity writer instance
+activity_writer = ActivityWriter()
@@ -4,14 +4,38 @@ Supports both PostgreSQL and SQLite
 """
 
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from datetime import datetime, timezone
 from typing import Optional
-from config.settings import settings
 from loguru import logger
 
 db = SQLAlchemy()
 
 
+class utcnow(FunctionElement):
+    """
+    Current UTC time as a naive timestamp, evaluated by the database
+    
+    Timestamp columns use it both as the INSERT default, so tables created
+    before the server default existed still get a value, and as the server
+    default for rows written with raw SQL.
+    """
+    type = db.DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow, 'postgresql')
+def _pg_utcnow(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+@compiles(utcnow)
+def _default_utcnow(element, compiler, **kw):
+    # SQLite's CURRENT_TIMESTAMP is already UTC
+    return "CURRENT_TIMESTAMP"
+
+
 def init_db(app):
     """Initialize database with Flask app"""
     db.init_app(app)
@@ -29,11 +53,92 @@ def init_db(app):
         try:
             db.create_all()
             logger.info("Database: All tables created successfully")
+            # Schema migrations are a separate step (migrate_database.py), not part of every boot
+            if has_legacy_user_positions():
+                logger.warning(
+                    "Database: users still has the legacy position columns; "
+                    "run 'python migrate_database.py' to migrate them"
+                )
         except Exception as e:
             logger.error(f"Database: Failed to create tables: {str(e)}")
             raise
 
 
+def _user_columns():
+    return {column['name'] for column in db.inspect(db.engine).get_columns('users')}
+
+
+def has_legacy_user_positions() -> bool:
+    """Check whether the users table still has the old denormalized position columns"""
+    return 'position' in _user_columns()
+
+
+def migrate_legacy_user_positions() -> bool:
+    """
+    Move users off the old denormalized position columns (run inside an app context)
+    
+    Databases created before users referenced user_positions by id stored
+    the position name and prefix on each user row. Positions that only
+    exist on user rows are created first, then users are linked to their
+    position by name. The old columns are only dropped once every user
+    with a position has been linked; otherwise they are left in place.
+    
+    Returns:
+        True if the database no longer has the legacy columns
+    """
+    columns = _user_columns()
+    if 'position' not in columns:
+        return True
+    
+    try:
+        return _migrate_user_positions(columns)
+    except Exception:
+        # Another process may have finished the same migration first
+        if not has_legacy_user_positions():
+            logger.info("Database: User positions were already migrated")
+            return True
+        raise
+
+
+def _migrate_user_positions(columns) -> bool:
+    if_exists = 'IF EXISTS ' if db.engine.dialect.name == 'postgresql' else ''
+    
+    with db.engine.begin() as conn:
+        if 'position_prefix' in columns:
+            created = conn.execute(db.text(
+                "INSERT INTO user_positions (position_name, position_prefix, is_active, created_at) "
+                "SELECT position, MIN(position_prefix), :active, :now FROM users "
+                "WHERE position IS NOT NULL AND position_prefix IS NOT NULL "
+                "AND position NOT IN (SELECT position_name FROM user_positions) "
+                "GROUP BY position"
+            ), {'active': True, 'now': datetime.now(timezone.utc).replace(tzinfo=None)}).rowcount
+            if created:
+                logger.info(f"Database: Created {created} positions found only on user rows")
+        
+        conn.execute(db.text(
+            "UPDATE users SET position_id = "
+            "(SELECT id FROM user_positions WHERE user_positions.position_name = users.position) "
+            "WHERE position_id IS NULL AND position IS NOT NULL"
+        ))
+        
+        unmatched = conn.execute(db.text(
+            "SELECT COUNT(*) FROM users WHERE position IS NOT NULL AND position_id IS NULL"
+        )).scalar()
+        if unmatched:
+            logger.warning(
+                f"Database: {unmatched} users have a position with no user_positions row; "
+                "keeping users.position and users.position_prefix until they are resolved"
+            )
+            return False
+        
+        conn.execute(db.text(f"ALTER TABLE users DROP COLUMN {if_exists}position"))
+        if 'position_prefix' in columns:
+            conn.execute(db.text(f"ALTER TABLE users DROP COLUMN {if_exists}position_prefix"))
+    
+    logger.info("Database: Migrated users to position references")
+    return True
+
+
 class UserPosition(db.Model):
     """User position/role definitions"""
     __tablename__ = 'user_positions'
@@ -43,7 +148,10 @@ class UserPosition(db.Model):
     position_prefix = db.Column(db.String(10), nullable=False)
     description = db.Column(db.Text, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=utcnow(), server_default=utcnow())
+    
+    # Relationships
+    users = db.relationship('User', back_populates='user_position', lazy=True)
     
     def __repr__(self):
         return f'<UserPosition {self.position_name} ({self.position_prefix})>'
@@ -58,19 +166,30 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     taiga_user_id = db.Column(db.Integer, nullable=True)
     position_id = db.Column(db.Integer, db.ForeignKey('user_positions.id'), nullable=True)
-    position = db.Column(db.String(100), nullable=True)  # Keep for backward compatibility
-    position_prefix = db.Column(db.String(10), nullable=True)  # Keep for backward compatibility
     preferred_ai_model = db.Column(db.String(50), default='gpt-3.5-turbo')
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=utcnow(), server_default=utcnow())
     is_active = db.Column(db.Boolean, default=True)
     
     # Relationships
-    user_position = db.relationship('UserPosition', backref='users', lazy=True)
-    activities = db.relationship('Activity', backref='user', lazy=True)
+    # Collections stay lazy so loading a user does not pull its whole history;
+    # list views should use .options(selectinload(User.activities))
+    # The position is needed for almost every activity title, so it is always joined in
+    user_position = db.relationship('UserPosition', back_populates='users', lazy='joined')
+    activities = db.relationship('Activity', back_populates='user', lazy=True)
+    
+    @property
+    def position(self) -> Optional[str]:
+        """Name of the user's position"""
+        return self.user_position.position_name if self.user_position else None
+    
+    @property
+    def position_prefix(self) -> Optional[str]:
+        """Activity title prefix of the user's position"""
+        return self.user_position.position_prefix if self.user_position else None
     
     def get_activity_prefix(self):
         """Get the activity prefix for this user"""
-        return f"[{self.position_prefix}]" if self.position_prefix else ""
+        return f"[{self.user_position.position_prefix}]" if self.user_position else ""
     
     def format_activity_title(self, title):
         """Format activity title with position prefix"""
@@ -93,10 +212,10 @@ class Project(db.Model):
     slug = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=utcnow(), server_default=utcnow())
     
     # Relationships
-    activities = db.relationship('Activity', backref='project', lazy=True)
+    activities = db.relationship('Activity', back_populates='project', lazy=True)
     
     def __repr__(self):
         return f'<Project {self.name}>'
@@ -105,6 +224,19 @@ class Project(db.Model):
 class Activity(db.Model):
     """Activity model for storing generated and submitted activities"""
     __tablename__ = 'activities'
+    __table_args__ = (
+        # Per-user reports by date, and the recent-activities listing per project
+        db.Index('ix_activity_user_date', 'user_id', 'activity_date'),
+        db.Index('ix_activity_project_user', 'project_id', 'user_id'),
+        db.Index('ix_activity_project_created', 'project_id', 'created_at'),
+        db.Index('ix_activity_created', 'created_at'),
+        # Small index over the Taiga re-submission queue only
+        db.Index(
+            'ix_activity_unsubmitted', 'user_id',
+            postgresql_where=db.text('submitted_to_taiga = false'),
+            sqlite_where=db.text('submitted_to_taiga = 0')
+        ),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -127,8 +259,13 @@ class Activity(db.Model):
     taiga_submission_error = db.Column(db.Text, nullable=True)
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=utcnow(), server_default=utcnow())
+    updated_at = db.Column(db.DateTime, default=utcnow(), server_default=utcnow(), onupdate=utcnow())
+    
+    # Relationships
+    # Users of a list of activities are loaded together in one IN query
+    user = db.relationship('User', back_populates='activities', lazy='selectin')
+    project = db.relationship('Project', back_populates='activities', lazy=True)
     
     def __repr__(self):
         return f'<Activity {self.title}>'
@@ -143,7 +280,19 @@ class AIPromptTemplate(db.Model):
     template = db.Column(db.Text, nullable=False)
     description = db.Column(db.Text, nullable=True)
     is_default = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=utcnow(), server_default=utcnow())
     
     def __repr__(self):
         return f'<AIPromptTemplate {self.name}>'
+
+
+class AppMetadata(db.Model):
+    """Key/value store for application bookkeeping (e.g. seed data versions)"""
+    __tablename__ = 'app_metadata'
+    
+    key = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.String(255), nullable=True)
+    updated_at = db.Column(db.DateTime, default=utcnow(), server_default=utcnow(), onupdate=utcnow())
+    
+    def __repr__(self):
+        return f'<AppMetadata {self.key}={self.value}>'
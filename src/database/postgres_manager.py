@@ -3,20 +3,119 @@ PostgreSQL Database Connection Manager for Written AI Chatbot
 Python equivalent of the Go connection.go file
 """
 
+import asyncio
+import csv
+import io
+import itertools
 import os
+import re
 import time
 import threading
 from typing import Optional, Dict, Any, List
 from contextlib import contextmanager
 from dataclasses import dataclass
+from datetime import datetime, timezone
 
 import psycopg2
-from psycopg2 import pool, extras
+from psycopg2.extras import execute_values
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 from sqlalchemy.pool import QueuePool
 from loguru import logger
-from config.settings import settings
+from config.settings import get_settings
+
+try:
+    import asyncpg
+except ImportError:  # async queries are unavailable without it
+    asyncpg = None
+
+# Rows sent per multi-row INSERT statement in execute_many
+_INSERT_PAGE_SIZE = 500
+
+# Stands in for the current UTC time in _ACTIVITY_COPY_COLUMNS
+_NOW = object()
+
+# Columns (and defaults for missing values) written by bulk_insert_activities.
+# Timestamps are sent explicitly because older tables have no column default
+_ACTIVITY_COPY_COLUMNS = (
+    ('user_id', None),
+    ('project_id', None),
+    ('title', None),
+    ('description', None),
+    ('hours_spent', 0.0),
+    ('activity_date', None),
+    ('ai_generated', False),
+    ('ai_model_used', None),
+    ('user_prompt', None),
+    ('submitted_to_taiga', False),
+    ('taiga_activity_id', None),
+    ('taiga_submission_error', None),
+    ('created_at', _NOW),
+    ('updated_at', _NOW),
+)
+
+_INSERT_VALUES_RE = re.compile(r'^\s*INSERT\b.*?\bVALUES\s*', re.IGNORECASE | re.DOTALL)
+# %% is matched first so an escaped percent is never read as a placeholder
+_PLACEHOLDER_RE = re.compile(r'%%|%s')
+
+
+def _to_server_placeholders(query: str) -> str:
+    """Rewrite %s placeholders as $1, $2, ... and unescape %% for PREPARE"""
+    counter = itertools.count(1)
+    return _PLACEHOLDER_RE.sub(
+        lambda m: '%' if m.group() == '%%' else f"${next(counter)}", query
+    )
+
+
+def _split_insert_values(query: str) -> Optional[tuple]:
+    """
+    Split a single-row INSERT into an execute_values statement and row template
+    
+    "INSERT INTO t (a, b) VALUES (%s, now()) RETURNING id" becomes
+    ("INSERT INTO t (a, b) VALUES %s RETURNING id", "(%s, now())").
+    Statements that are not of this form (or are upserts) return None.
+    """
+    match = _INSERT_VALUES_RE.match(query)
+    # An upsert batch may touch the same row twice, which a single statement rejects
+    if match is None or re.search(r'\bDO\s+UPDATE\b', query, re.IGNORECASE):
+        return None
+    
+    start = match.end()
+    if query.startswith('%s', start):
+        return query, None  # Already written for execute_values
+    if not query.startswith('(', start):
+        return None
+    
+    # Find the parenthesis closing the row template
+    depth = 0
+    for index in range(start, len(query)):
+        if query[index] == '(':
+            depth += 1
+        elif query[index] == ')':
+            depth -= 1
+            if depth == 0:
+                return query[:start] + '%s' + query[index + 1:], query[start:index + 1]
+    return None
+
+
+def _fetch_results(cursor, fetch_one: bool, as_dict: bool = True):
+    """
+    Read a cursor's results as dictionaries, or as plain tuples if as_dict is False
+    
+    Rows are fetched as tuples and zipped with the column names once,
+    which is cheaper than a dict-building cursor followed by a copy.
+    """
+    if fetch_one:
+        result = cursor.fetchone()
+        if result is None or not as_dict:
+            return result
+        return dict(zip([column[0] for column in cursor.description], result))
+    
+    results = cursor.fetchall()
+    if not as_dict:
+        return results
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in results]
 
 
 @dataclass
@@ -32,6 +131,12 @@ class DatabaseConfig:
     max_overflow: int = 10
     pool_timeout: int = 30
     pool_recycle: int = 3600  # 1 hour
+    # Session settings applied once per physical connection
+    application_name: str = "written-io"
+    statement_timeout_ms: int = 15000
+    idle_in_transaction_timeout_ms: int = 30000
+    # statement_timeout for bulk COPY loads (0 disables it)
+    bulk_statement_timeout_ms: int = 0
 
 
 class DatabaseConnectionError(Exception):
@@ -48,9 +153,17 @@ class DatabaseManager:
     def __init__(self, config: DatabaseConfig):
         self.config = config
         self.engine: Optional[Engine] = None
-        self.connection_pool: Optional[pool.ThreadedConnectionPool] = None
         self._lock = threading.Lock()
         self._initialized = False
+        # Raw connections currently checked out through get_connection; updated
+        # without a lock since it only feeds monitoring
+        self._in_use = 0
+        # Connection held by the current thread's outermost get_connection
+        self._local = threading.local()
+        
+        # asyncpg pool for non-blocking queries from async code, bound to one event loop
+        self._async_pool = None
+        self._async_pool_loop = None
         
     def get_connection_string(self) -> str:
         """Build PostgreSQL connection string"""
@@ -75,16 +188,18 @@ class DatabaseManager:
                 connection_string = self.get_connection_string()
                 logger.info(f"postgres: Initializing connection to {self.config.host}:{self.config.port}")
                 
-                # Create SQLAlchemy engine with connection pooling
+                # Create SQLAlchemy engine with connection pooling; raw connections
+                # come from the same pool, which may grow up to max_pool for them
                 self.engine = create_engine(
                     connection_string,
                     poolclass=QueuePool,
                     pool_size=self.config.min_pool,
-                    max_overflow=self.config.max_overflow,
+                    max_overflow=max(self.config.max_overflow, self.config.max_pool - self.config.min_pool),
                     pool_timeout=self.config.pool_timeout,
                     pool_recycle=self.config.pool_recycle,
                     pool_pre_ping=True,  # Validate connections before use
-                    echo=False  # Set to True for SQL debugging
+                    echo=False,  # Set to True for SQL debugging
+                    connect_args=self._connect_args()
                 )
                 
                 # Test the connection
@@ -92,7 +207,6 @@ class DatabaseManager:
                     result = conn.execute(text("SELECT 1"))
                     logger.info("postgres: Connection test successful")
                 
-                self._init_raw_connection_pool()
                 self._initialized = True
                 
                 logger.info("postgres: PostgreSQL initialized successfully")
@@ -102,23 +216,21 @@ class DatabaseManager:
                 logger.error(f"postgres: Failed to connect to PostgreSQL: {str(e)}")
                 raise DatabaseConnectionError(f"Failed to connect to database: {str(e)}")
     
-    def _init_raw_connection_pool(self):
-        """Initialize raw psycopg2 connection pool for non-ORM operations"""
-        try:
-            self.connection_pool = psycopg2.pool.ThreadedConnectionPool(
-                minconn=self.config.min_pool,
-                maxconn=self.config.max_pool,
-                host=self.config.host,
-                port=self.config.port,
-                user=self.config.user,
-                password=self.config.password,
-                database=self.config.database,
-                cursor_factory=extras.RealDictCursor  # Return results as dictionaries
+    def _connect_args(self) -> Dict[str, Any]:
+        """
+        libpq connection parameters carrying the session settings
+        
+        They travel in the connection startup packet, so each physical
+        connection is tuned once without any extra round-trip, and a
+        runaway query or abandoned transaction cannot hold a pool slot forever.
+        """
+        return {
+            'application_name': self.config.application_name,
+            'options': (
+                f"-c statement_timeout={self.config.statement_timeout_ms} "
+                f"-c idle_in_transaction_session_timeout={self.config.idle_in_transaction_timeout_ms}"
             )
-            logger.info("postgres: Raw connection pool initialized")
-        except Exception as e:
-            logger.error(f"postgres: Failed to initialize connection pool: {str(e)}")
-            raise DatabaseConnectionError(f"Failed to initialize connection pool: {str(e)}")
+        }
     
     def get_engine(self) -> Engine:
         """Get SQLAlchemy engine (for ORM operations)"""
@@ -131,22 +243,44 @@ class DatabaseManager:
         """
         Get a raw database connection from the pool
         Use this for direct SQL operations outside of SQLAlchemy ORM
+        
+        The connection is checked out of the SQLAlchemy engine's pool and
+        returned to it afterwards, so ORM and raw access share one pool.
+        Nested calls on the same thread reuse the outer connection without
+        going back to the pool, so wrapping several execute_* calls in
+        `with manager.get_connection():` runs them as one transaction: the
+        wrapped calls leave committing to this outermost scope, which commits
+        when the block exits normally and rolls everything back on error.
         """
-        if self.connection_pool is None:
+        if self.engine is None:
             raise DatabaseConnectionError("Connection pool is not initialized")
         
+        held = getattr(self._local, 'connection', None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+        
         connection = None
         try:
-            connection = self.connection_pool.getconn()
-            if connection is None:
-                raise DatabaseConnectionError("Failed to get connection from pool")
+            connection = self.engine.raw_connection()
+            self._local.connection = connection
+            self._local.depth = 1
+            self._local.commit_pending = False
+            self._in_use += 1
             
-            # Log connection stats if too many connections are open
-            if hasattr(self.connection_pool, '_used') and len(self.connection_pool._used) > 15:
-                logger.warning(f"postgres: High connection usage: {len(self.connection_pool._used)} connections")
+            # Warn when raw users hold every connection the pool may open
+            if self._in_use >= self.config.max_pool:
+                logger.warning(f"postgres: High connection usage: {self._in_use} connections")
             
             yield connection
             
+            if self._local.commit_pending:
+                connection.commit()
+            
         except Exception as e:
             if connection:
                 connection.rollback()
@@ -154,29 +288,88 @@ class DatabaseManager:
             raise
         finally:
             if connection:
-                self.connection_pool.putconn(connection)
+                self._local.connection = None
+                self._in_use -= 1
+                connection.close()  # Returns the connection to the pool
+    
+    def _commit(self, conn):
+        """Commit, or defer to the outermost get_connection scope when nested"""
+        if self._local.depth > 1:
+            self._local.commit_pending = True
+        else:
+            conn.commit()
+    
+    def _rollback(self, conn):
+        """Roll back unless nested; the error then rolls back the outermost scope"""
+        if self._local.depth == 1:
+            conn.rollback()
     
-    def execute_query(self, query: str, params: Optional[tuple] = None, fetch_one: bool = False) -> Optional[List[Dict[str, Any]]]:
+    def execute_query(
+        self,
+        query: str,
+        params: Optional[tuple] = None,
+        fetch_one: bool = False,
+        as_dict: bool = True
+    ) -> Optional[List[Dict[str, Any]]]:
         """
         Execute a SELECT query and return results
         Python equivalent of the DatabaseHandlerFunc for SELECT operations
+        
+        Pass as_dict=False for internal lookups to get plain tuples instead
+        of dictionaries.
         """
         with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 try:
                     cursor.execute(query, params)
-                    
-                    if fetch_one:
-                        result = cursor.fetchone()
-                        return dict(result) if result else None
-                    else:
-                        results = cursor.fetchall()
-                        return [dict(row) for row in results] if results else []
+                    return _fetch_results(cursor, fetch_one, as_dict)
                         
                 except Exception as e:
                     logger.error(f"postgres: Query execution failed: {str(e)}")
                     raise
     
+    def execute_query_prepared(
+        self,
+        name: str,
+        query: str,
+        params: Optional[tuple] = None,
+        fetch_one: bool = False,
+        as_dict: bool = True
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Execute a hot SELECT query as a server-side prepared statement
+        
+        The statement is prepared once per pooled connection under `name`,
+        so later calls skip parsing and planning; reusing a name with a
+        different query re-prepares it. The query uses %s placeholders
+        (%% for a literal percent) and returns results like execute_query.
+        """
+        if not name.isidentifier():
+            raise ValueError(f"Invalid prepared statement name: {name!r}")
+        
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                try:
+                    # conn.info lives as long as the underlying DBAPI connection
+                    prepared = conn.info.setdefault('prepared_statements', {})
+                    if prepared.get(name) != query:
+                        if name in prepared:
+                            # Same name, different SQL: replace the stale statement
+                            cursor.execute(f"DEALLOCATE {name}")
+                            del prepared[name]
+                        cursor.execute(f"PREPARE {name} AS {_to_server_placeholders(query)}")
+                        prepared[name] = query
+                    
+                    if params:
+                        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+                    else:
+                        cursor.execute(f"EXECUTE {name}")
+                    return _fetch_results(cursor, fetch_one, as_dict)
+                
+                except Exception as e:
+                    logger.error(f"postgres: Prepared query execution failed: {str(e)}")
+                    raise
+    
     def execute_command(self, query: str, params: Optional[tuple] = None) -> int:
         """
         Execute an INSERT, UPDATE, or DELETE command
@@ -188,7 +381,7 @@ class DatabaseManager:
                 try:
                     cursor.execute(query, params)
                     affected_rows = cursor.rowcount
-                    conn.commit()
+                    self._commit(conn)
                     
                     if affected_rows == 0:
                         logger.warning("postgres: No rows affected by the query")
@@ -196,24 +389,158 @@ class DatabaseManager:
                     return affected_rows
                     
                 except Exception as e:
-                    conn.rollback()
+                    self._rollback(conn)
                     logger.error(f"postgres: Command execution failed: {str(e)}")
                     raise
     
     def execute_many(self, query: str, params_list: List[tuple]) -> int:
-        """Execute a query with multiple parameter sets"""
+        """
+        Execute a query with multiple parameter sets
+        
+        Single-row INSERTs are sent as multi-row INSERT statements of up to
+        _INSERT_PAGE_SIZE rows each instead of one statement per row.
+        """
+        insert = _split_insert_values(query)
+        
         with self.get_connection() as conn:
             with conn.cursor() as cursor:
                 try:
-                    cursor.executemany(query, params_list)
-                    affected_rows = cursor.rowcount
-                    conn.commit()
+                    if insert is not None:
+                        statement, template = insert
+                        affected_rows = 0
+                        for start in range(0, len(params_list), _INSERT_PAGE_SIZE):
+                            page = params_list[start:start + _INSERT_PAGE_SIZE]
+                            execute_values(cursor, statement, page, template=template, page_size=len(page))
+                            affected_rows += cursor.rowcount
+                    else:
+                        cursor.executemany(query, params_list)
+                        affected_rows = cursor.rowcount
+                    self._commit(conn)
                     return affected_rows
                 except Exception as e:
-                    conn.rollback()
+                    self._rollback(conn)
                     logger.error(f"postgres: Batch execution failed: {str(e)}")
                     raise
     
+    async def _get_async_pool(self):
+        """Get the asyncpg pool for the current event loop, creating it on first use"""
+        if asyncpg is None:
+            raise DatabaseConnectionError("asyncpg package not installed")
+        
+        loop = asyncio.get_running_loop()
+        if self._async_pool is None or self._async_pool_loop is not loop:
+            # Pools cannot be shared across loops; one left on a finished loop is dropped
+            try:
+                pool = await asyncpg.create_pool(
+                    host=self.config.host,
+                    port=self.config.port,
+                    user=self.config.user,
+                    password=self.config.password,
+                    database=self.config.database,
+                    min_size=self.config.min_pool,
+                    max_size=self.config.max_pool,
+                    max_inactive_connection_lifetime=self.config.pool_recycle,
+                    server_settings={
+                        'application_name': self.config.application_name,
+                        'statement_timeout': str(self.config.statement_timeout_ms),
+                        'idle_in_transaction_session_timeout': str(self.config.idle_in_transaction_timeout_ms)
+                    }
+                )
+            except Exception as e:
+                logger.error(f"postgres: Failed to initialize async connection pool: {str(e)}")
+                raise DatabaseConnectionError(f"Failed to initialize async connection pool: {str(e)}")
+            
+            if self._async_pool is not None and self._async_pool_loop is loop:
+                # Another coroutine created the pool while this one was connecting
+                await pool.close()
+            else:
+                self._async_pool = pool
+                self._async_pool_loop = loop
+                logger.info("postgres: Async connection pool initialized")
+        return self._async_pool
+    
+    async def execute_query_async(self, query: str, *args, fetch_one: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """
+        Execute a SELECT query without blocking the event loop
+        
+        Uses asyncpg, so placeholders are $1, $2, ... rather than %s.
+        Results have the same shape as execute_query.
+        """
+        pool = await self._get_async_pool()
+        try:
+            if fetch_one:
+                row = await pool.fetchrow(query, *args)
+                return dict(row) if row else None
+            return [dict(row) for row in await pool.fetch(query, *args)]
+        except Exception as e:
+            logger.error(f"postgres: Async query execution failed: {str(e)}")
+            raise
+    
+    async def execute_command_async(self, query: str, *args) -> int:
+        """
+        Execute an INSERT, UPDATE, or DELETE command without blocking the event loop
+        Returns the number of affected rows
+        """
+        pool = await self._get_async_pool()
+        try:
+            # asyncpg returns the command tag, e.g. "UPDATE 3"
+            status = await pool.execute(query, *args)
+            affected_rows = int(status.rsplit(' ', 1)[-1]) if status[-1:].isdigit() else 0
+            
+            if affected_rows == 0:
+                logger.warning("postgres: No rows affected by the query")
+            
+            return affected_rows
+        except Exception as e:
+            logger.error(f"postgres: Async command execution failed: {str(e)}")
+            raise
+    
+    async def aclose(self):
+        """Close the asyncpg pool (call from the event loop that used it)"""
+        if self._async_pool is not None and self._async_pool_loop is asyncio.get_running_loop():
+            await self._async_pool.close()
+            logger.info("postgres: Async connection pool closed")
+        self._async_pool = None
+        self._async_pool_loop = None
+    
+    def bulk_insert_activities(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        Insert many activities in one COPY FROM STDIN stream
+        
+        Much faster than INSERT statements for imports and backfills. Rows
+        are dictionaries keyed by Activity column names; missing optional
+        columns get the model defaults. The load runs under
+        config.bulk_statement_timeout_ms rather than the session timeout.
+        
+        Returns the number of inserted rows
+        """
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            values = (
+                row.get(column, now if default is _NOW else default)
+                for column, default in _ACTIVITY_COPY_COLUMNS
+            )
+            # \N marks NULL, keeping it distinct from an empty string
+            writer.writerow([r'\N' if value is None else value for value in values])
+        buffer.seek(0)
+        
+        columns = ', '.join(column for column, _ in _ACTIVITY_COPY_COLUMNS)
+        with self.get_connection() as conn:
+            with conn.cursor() as cursor:
+                try:
+                    # Imports outlast the per-session statement_timeout; SET LOCAL ends with the transaction
+                    cursor.execute("SET LOCAL statement_timeout = %s", (self.config.bulk_statement_timeout_ms,))
+                    cursor.copy_expert(f"COPY activities ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+                    affected_rows = cursor.rowcount
+                    self._commit(conn)
+                    return affected_rows
+                except Exception as e:
+                    self._rollback(conn)
+                    logger.error(f"postgres: Bulk activity insert failed: {str(e)}")
+                    raise
+    
     def test_connection(self) -> bool:
         """Test if the database connection is working"""
         try:
@@ -225,29 +552,21 @@ class DatabaseManager:
     
     def get_connection_stats(self) -> Dict[str, Any]:
         """Get connection pool statistics"""
-        if self.connection_pool is None:
+        if self.engine is None:
             return {"status": "not_initialized"}
         
-        # Note: psycopg2 pool doesn't expose detailed stats like Go's sqlx
-        # This is a basic implementation
-        stats = {
+        return {
             "status": "initialized",
             "min_connections": self.config.min_pool,
             "max_connections": self.config.max_pool,
+            "active_connections": self.engine.pool.checkedout(),
+            "raw_connections_in_use": self._in_use,
+            "pool_status": self.engine.pool.status()
         }
-        
-        if hasattr(self.connection_pool, '_used'):
-            stats["active_connections"] = len(self.connection_pool._used)
-        
-        return stats
     
     def close(self):
         """Close all database connections"""
         try:
-            if self.connection_pool:
-                self.connection_pool.closeall()
-                logger.info("postgres: Connection pool closed")
-            
             if self.engine:
                 self.engine.dispose()
                 logger.info("postgres: SQLAlchemy engine disposed")
@@ -266,36 +585,48 @@ class DatabaseSingleton:
     
     @classmethod
     def get_instance(cls) -> DatabaseManager:
-        """Get or create the singleton database manager instance"""
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    # Parse database configuration from settings
-                    if settings.database_url.startswith('postgresql://'):
-                        # Parse from URL
-                        import urllib.parse as urlparse
-                        parsed = urlparse.urlparse(settings.database_url)
-                        
-                        config = DatabaseConfig(
-                            host=parsed.hostname or 'localhost',
-                            port=parsed.port or 5432,
-                            user=parsed.username or 'postgres',
-                            password=parsed.password or '',
-                            database=parsed.path.lstrip('/') or 'postgres'
-                        )
-                    else:
-                        # Use individual settings (fallback)
-                        config = DatabaseConfig(
-                            host=getattr(settings, 'postgres_host', 'localhost'),
-                            port=getattr(settings, 'postgres_port', 5432),
-                            user=getattr(settings, 'postgres_user', 'postgres'),
-                            password=getattr(settings, 'postgres_password', ''),
-                            database=getattr(settings, 'postgres_db', 'postgres')
-                        )
-                    
-                    cls._instance = DatabaseManager(config)
-                    cls._instance.connect()
+        """
+        Get or create the singleton database manager instance
+        
+        Once created, the instance is returned with a single attribute load;
+        the lock is only taken while it is being created.
+        """
+        instance = cls._instance
+        if instance is not None:
+            return instance
         
+        with cls._lock:
+            if cls._instance is None:
+                # Parse database configuration from settings
+                settings = get_settings()
+                if settings.database_url.startswith('postgresql://'):
+                    # Parse from URL
+                    import urllib.parse as urlparse
+                    parsed = urlparse.urlparse(settings.database_url)
+                    
+                    config = DatabaseConfig(
+                        host=parsed.hostname or 'localhost',
+                        port=parsed.port or 5432,
+                        user=parsed.username or 'postgres',
+                        password=parsed.password or '',
+                        database=parsed.path.lstrip('/') or 'postgres'
+                    )
+                else:
+                    # Use individual settings (fallback)
+                    config = DatabaseConfig(
+                        host=getattr(settings, 'postgres_host', 'localhost'),
+                        port=getattr(settings, 'postgres_port', 5432),
+                        user=getattr(settings, 'postgres_user', 'postgres'),
+                        password=getattr(settings, 'postgres_password', ''),
+                        database=getattr(settings, 'postgres_db', 'postgres')
+                    )
+                
+                # Only publish the manager once it is connected, so a failed
+                # connection is retried by the next caller
+                manager = DatabaseManager(config)
+                manager.connect()
+                cls._instance = manager
+    
         return cls._instance
     
     @classmethod
@@ -0,0 +1,116 @@
+"""
+Startup profiling for Written AI Chatbot
+Times module imports and app initialization phases when --profile-startup is passed
+"""
+
+import importlib.abc
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Tuple
+
+PROFILE_FLAG = '--profile-startup'
+
+# module name -> (self ns, cumulative ns)
+_import_times: Dict[str, Tuple[int, int]] = {}
+# [depth, phase name, ns] in start order, so parents precede their children
+_phase_times: List[list] = []
+_import_stack: List[int] = []
+_phase_depth = 0
+_enabled = False
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """Loader proxy that records how long a module takes to execute"""
+
+    def __init__(self, loader, fullname: str):
+        self._loader = loader
+        self._fullname = fullname
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        # Children push their cumulative time onto our slot so we can derive self time
+        _import_stack.append(0)
+        start = time.perf_counter_ns()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            cumulative = time.perf_counter_ns() - start
+            children = _import_stack.pop()
+            if _import_stack:
+                _import_stack[-1] += cumulative
+            _import_times[self._fullname] = (cumulative - children, cumulative)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    """Meta path finder that wraps every located module's loader with _TimedLoader"""
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, fullname)
+        return spec
+
+
+def is_requested() -> bool:
+    """Check whether startup profiling was requested on the command line"""
+    return PROFILE_FLAG in sys.argv
+
+
+def enable():
+    """Start recording import times (call before the imports to measure)"""
+    global _enabled
+    if not _enabled:
+        sys.meta_path.insert(0, _ImportTimer())
+        _enabled = True
+
+
+@contextmanager
+def _timed_phase(name: str):
+    global _phase_depth
+    entry = [_phase_depth, name, 0]
+    _phase_times.append(entry)
+    _phase_depth += 1
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        _phase_depth -= 1
+        entry[2] = time.perf_counter_ns() - start
+
+
+def phase(name: str):
+    """Time an initialization phase; a no-op unless profiling is enabled"""
+    return _timed_phase(name) if _enabled else nullcontext()
+
+
+def report(top: int = 25, stream=None):
+    """Write the import ranking and phase breakdown collected so far"""
+    stream = stream or sys.stderr
+
+    lines = ["", "=" * 72, f"Startup profile: top {top} imports by cumulative time", "=" * 72]
+    lines.append(f"{'cumulative ms':>14} {'self ms':>10}  module")
+    ranked = sorted(_import_times.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (self_ns, cumulative_ns) in ranked[:top]:
+        lines.append(f"{cumulative_ns / 1e6:>14.2f} {self_ns / 1e6:>10.2f}  {name}")
+    lines.append(f"({len(_import_times)} modules imported while profiling)")
+
+    if _phase_times:
+        lines.extend(["", "Initialization phases:"])
+        for depth, name, ns in _phase_times:
+            lines.append(f"{'  ' * depth}{name}: {ns / 1e6:.2f} ms")
+
+    stream.write("\n".join(lines) + "\n")
@@ -0,0 +1,69 @@
+"""
+JSON serialization for Written AI Chatbot responses
+Uses orjson when available, with the stdlib json module as a fallback
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any, Union
+
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback
+    orjson = None
+
+_ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+    if orjson else 0
+)
+
+
+def _default(obj: Any) -> Any:
+    """Serialize types neither encoder handles natively"""
+    # orjson emits ISO 8601 for dates itself; keep the stdlib fallback consistent
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    return DefaultJSONProvider.default(obj)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS, default=_default)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson (dates serialize as ISO 8601)"""
+
+    default = staticmethod(_default)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS, default=self.default).decode()
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        if orjson is None:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        if orjson is None:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        option = _ORJSON_OPTIONS
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+
+        # Build the body straight from bytes, skipping the str round-trip
+        return self._app.response_class(
+            orjson.dumps(obj, option=option, default=self.default) + b"\n",
+            mimetype=self.mimetype
+        )
@@ -3,32 +3,231 @@ Web routes for Written AI Chatbot
 Handles HTTP requests and responses for the web interface
 """
 
-from flask import Blueprint, request, jsonify, render_template
-from datetime import datetime, date
+from flask import Blueprint, Response, current_app, g, request, jsonify, render_template, stream_with_context
+from datetime import date
 from src.ai.generator import ai_service
 from src.api.taiga_client import taiga_api
 from src.database.models import db, User, Project, Activity, UserPosition
-from config.settings import settings
+from src.database.activity_writer import activity_writer
+from src.web.json_provider import dumps_bytes
+from sqlalchemy import text
+from werkzeug.exceptions import HTTPException
 from loguru import logger
-import asyncio
+from src.async_bridge import iter_async, run_async
+import re
+import threading
+import time
+import zlib
 
 bp = Blueprint('main', __name__)
 
+# Rows fetched per round-trip when streaming activity lists
+_ACTIVITY_BATCH_SIZE = 200
+
+# Descriptions that already start with a "[PREFIX]" (leading whitespace allowed);
+# matching in place avoids copying the whole description with strip()
+_BRACKET_PREFIX_RE = re.compile(r'\s*\[')
+
+_TASK_TYPES = ('feature', 'bug_fix', 'improvement', 'technical_debt', 'research')
+_VALID_TASK_TYPES = frozenset(_TASK_TYPES)
+_INVALID_TASK_TYPE_ERROR = f"Invalid task_type. Must be one of: {', '.join(_TASK_TYPES)}"
+
+# date.fromisoformat also takes compact and week dates; only YYYY-MM-DD is accepted
+_DATE_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+_INVALID_DATE_ERROR = 'date must be YYYY-MM-DD'
+
+# Health check body, rebuilt when the (second-resolution) timestamp changes
+_HEALTH_TEMPLATE = b'{"status":"healthy","timestamp":"%s","version":"1.0.0"}'
+_health_body = b''
+_health_second = None
+
+# Points a user at a position and returns what set_user_position reports
+_SET_USER_POSITION_SQL = text(
+    "UPDATE users SET position_id = p.id FROM user_positions p "
+    "WHERE users.id = :user_id AND p.id = :position_id "
+    "RETURNING users.id, users.username, p.position_name, p.position_prefix"
+)
+
+# Active positions as a JSON array, in the shape of get_user_positions
+_ACTIVE_POSITIONS_JSON_SQL = text(
+    "SELECT COALESCE(json_agg(json_build_object("
+    "'id', id, 'position_name', position_name, "
+    "'position_prefix', position_prefix, 'description', description"
+    ") ORDER BY id) FILTER (WHERE is_active), '[]'::json)::text "
+    "FROM user_positions"
+)
+
+# Rendered index page and how long browsers/proxies may reuse it
+_index_html = None
+_INDEX_MAX_AGE = 300
+
+# Pre-serialized bodies of rarely changing endpoints: name -> (expires_at, body)
+_RESPONSE_CACHE_TTL = 30.0
+_response_cache = {}
+_response_cache_lock = threading.Lock()
+_response_cache_generation = 0
+
+
+def json_response(obj, status=200):
+    """Build a JSON response directly from serialized bytes (for large payloads)"""
+    return Response(dumps_bytes(obj), status=status, mimetype='application/json')
+
+
+def _gzip_stream(chunks, level):
+    """Gzip-compress a streamed body incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _json():
+    """Parse the JSON request body with the app's JSON provider (empty dict if missing or malformed)"""
+    body = request.get_data(cache=False)
+    if not body:
+        return {}
+    try:
+        return current_app.json.loads(body)
+    except ValueError:
+        return {}
+
+
+def _parse_date(value):
+    """Parse a YYYY-MM-DD date, raising ValueError for anything else"""
+    if not isinstance(value, str) or not _DATE_RE.fullmatch(value):
+        raise ValueError(_INVALID_DATE_ERROR)
+    return date.fromisoformat(value)
+
+
+def _get_user(user_id):
+    """Look up a user, at most once per request (repeats are served from flask.g)"""
+    users = g.setdefault('_users', {})
+    if user_id not in users:
+        users[user_id] = db.session.get(User, user_id)
+    return users[user_id]
+
+
+def cached_json_response(name, build):
+    """
+    Serve a JSON body from the in-process response cache
+    
+    On a miss (or after the TTL) build() is called for the payload (or an
+    already serialized body), which is reused until invalidate_cached_responses().
+    """
+    now = time.monotonic()
+    entry = _response_cache.get(name)
+    if entry is not None and entry[0] > now:
+        return Response(entry[1], mimetype='application/json')
+    
+    generation = _response_cache_generation
+    body = build()
+    if not isinstance(body, bytes):
+        body = dumps_bytes(body)
+    with _response_cache_lock:
+        # Skip the store if the data changed while we were building
+        if generation == _response_cache_generation:
+            _response_cache[name] = (now + _RESPONSE_CACHE_TTL, body)
+    return Response(body, mimetype='application/json')
+
+
+def invalidate_cached_responses():
+    """Drop cached responses after positions or users change"""
+    global _response_cache_generation
+    with _response_cache_lock:
+        _response_cache_generation += 1
+        _response_cache.clear()
+
+
+# 500 error messages for endpoints that don't use the generic one
+_ERROR_MESSAGES = {
+    'get_projects': 'Failed to fetch projects',
+    'get_user_positions': 'Failed to fetch positions',
+    'set_user_position': 'Failed to set user position',
+    'add_position': 'Failed to add position',
+    'get_current_user': 'Failed to fetch user information',
+    'get_activities': 'Failed to fetch activities',
+}
+
+
+@bp.errorhandler(HTTPException)
+def handle_http_error(e):
+    """Return HTTP errors raised in a view as the JSON error envelope"""
+    return jsonify({
+        'success': False,
+        'error': e.description
+    }), e.code
+
+
+@bp.errorhandler(Exception)
+def handle_error(e):
+    """Log unexpected view errors and return the endpoint's 500 response"""
+    endpoint = (request.endpoint or '').rpartition('.')[2]
+    logger.error(f"Error in {endpoint}: {str(e)}")
+    return jsonify({
+        'success': False,
+        'error': _ERROR_MESSAGES.get(endpoint, 'Internal server error')
+    }), 500
+
 
 @bp.route('/')
 def index():
     """Main chatbot interface"""
-    return render_template('index.html')
+    global _index_html
+    # The template has no dynamic content, so render it once (re-render in debug for live edits)
+    if _index_html is None or current_app.debug:
+        _index_html = render_template('index.html').encode()
+    return Response(
+        _index_html,
+        mimetype='text/html',
+        headers={'Cache-Control': f'public, max-age={_INDEX_MAX_AGE}'}
+    )
 
 
 @bp.route('/api/health')
 def health_check():
     """Health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'timestamp': datetime.utcnow().isoformat(),
-        'version': '1.0.0'
-    })
+    global _health_body, _health_second
+    # Load balancers poll this often; rebuild the body at most once per second
+    now = int(time.time())
+    if now != _health_second:
+        timestamp = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(now)).encode()
+        _health_body = _HEALTH_TEMPLATE % timestamp
+        _health_second = now
+    return Response(_health_body, mimetype='application/json')
+
+
+def _activity_context(data, activity_date):
+    """
+    Build the AI context for an activity generation request
+    
+    Returns:
+        Tuple of (context dict, requesting user or None)
+    """
+    # Build context for AI generation
+    context = {
+        'date': activity_date,
+        'estimated_hours': data.get('hours', 0.0)
+    }
+    
+    # Get project info if provided
+    project_id = data.get('project_id')
+    if project_id:
+        project = Project.query.filter_by(taiga_project_id=project_id).first()
+        if project:
+            context['project_name'] = project.name
+    
+    # Get current user for position prefix
+    user_id = data.get('user_id', 1)
+    user = _get_user(user_id)
+    
+    # Add user position context
+    if user and user.position:
+        context['user_position'] = user.position
+        context['position_prefix'] = user.position_prefix
+    
+    return context, user
 
 
 @bp.route('/api/generate-activity', methods=['POST'])
@@ -45,87 +244,125 @@ def generate_activity():
         "ai_model": "gpt-3.5-turbo"  // optional
     }
     """
+    data = _json()
+    
+    if not data or not data.get('user_input'):
+        return jsonify({
+            'success': False,
+            'error': 'user_input is required'
+        }), 400
+    
+    user_input = data['user_input']
     try:
-        data = request.get_json()
-        
-        if not data or not data.get('user_input'):
-            return jsonify({
-                'success': False,
-                'error': 'user_input is required'
-            }), 400
-        
-        user_input = data['user_input']
-        project_id = data.get('project_id')
-        hours = data.get('hours', 0.0)
-        activity_date = data.get('date', date.today().isoformat())
-        ai_model = data.get('ai_model')
-        
-        # Build context for AI generation
-        context = {
-            'date': activity_date,
-            'estimated_hours': hours
-        }
-        
-        # Get project info if provided
-        if project_id:
-            project = Project.query.filter_by(taiga_project_id=project_id).first()
-            if project:
-                context['project_name'] = project.name
-        
-        # Get current user for position prefix
-        user_id = data.get('user_id', 1)
-        user = User.query.get(user_id)
-        
-        # Add user position context
-        if user and user.position:
-            context['user_position'] = user.position
-            context['position_prefix'] = user.position_prefix
-        
-        # Generate activity description using AI
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        result = loop.run_until_complete(
-            ai_service.generate_activity_description(
-                user_input=user_input,
-                context=context,
-                model=ai_model
-            )
+        activity_date = _parse_date(data['date']) if data.get('date') else date.today()
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': _INVALID_DATE_ERROR
+        }), 400
+    ai_model = data.get('ai_model')
+    context, user = _activity_context(data, activity_date)
+    
+    # Generate activity description using AI
+    result = run_async(
+        ai_service.generate_activity_description(
+            user_input=user_input,
+            context=context,
+            model=ai_model
         )
+    )
+    
+    if result.get('success'):
+        # Apply position prefix to the generated description
+        description = result['description']
+        if user and user.position_prefix:
+            # Check if description already has a prefix
+            if not _BRACKET_PREFIX_RE.match(description):
+                description = f"[{user.position_prefix}] {description}"
         
-        loop.close()
-        
-        if result.get('success'):
-            # Apply position prefix to the generated description
-            description = result['description']
-            if user and user.position_prefix:
-                # Check if description already has a prefix
-                if not description.strip().startswith('['):
-                    description = f"[{user.position_prefix}] {description}"
-            
-            return jsonify({
-                'success': True,
-                'description': description,
-                'model_used': result.get('model_used'),
-                'provider': result.get('provider'),
-                'is_fallback': result.get('is_fallback', False),
-                'position_prefix': user.position_prefix if user else None
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': result.get('error', 'AI generation failed'),
-                'fallback_description': result.get('fallback_description')
-            }), 500
-            
-    except Exception as e:
-        logger.error(f"Error in generate_activity: {str(e)}")
+        return jsonify({
+            'success': True,
+            'description': description,
+            'model_used': result.get('model_used'),
+            'provider': result.get('provider'),
+            'is_fallback': result.get('is_fallback', False),
+            'position_prefix': user.position_prefix if user else None
+        })
+    else:
         return jsonify({
             'success': False,
-            'error': 'Internal server error'
+            'error': result.get('error', 'AI generation failed'),
+            'fallback_description': result.get('fallback_description')
         }), 500
 
 
+@bp.route('/api/generate-activity/stream', methods=['POST'])
+def generate_activity_stream():
+    """
+    Stream an AI activity description as plain text while it is generated
+    
+    Takes the same JSON payload as /api/generate-activity. The body is the
+    description itself, position prefix included, sent in chunks; generated
+    text is not cached.
+    """
+    data = _json()
+    
+    if not data or not data.get('user_input'):
+        return jsonify({
+            'success': False,
+            'error': 'user_input is required'
+        }), 400
+    
+    user_input = data['user_input']
+    try:
+        activity_date = _parse_date(data['date']) if data.get('date') else date.today()
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': _INVALID_DATE_ERROR
+        }), 400
+    ai_model = data.get('ai_model')
+    context, user = _activity_context(data, activity_date)
+    # Read now: the user is not loaded again once the body starts streaming
+    position_prefix = user.position_prefix if user else None
+    
+    chunks = iter_async(
+        ai_service.agenerate_activity_description_stream(
+            user_input=user_input,
+            context=context,
+            model=ai_model
+        )
+    )
+    
+    def generate():
+        # Hold text back until it shows whether the model wrote its own prefix
+        pending = ''
+        try:
+            for chunk in chunks:
+                if pending is None:
+                    yield chunk.encode()
+                    continue
+                pending += chunk
+                if pending.strip():
+                    if position_prefix and not _BRACKET_PREFIX_RE.match(pending):
+                        pending = f"[{position_prefix}] {pending.lstrip()}"
+                    yield pending.encode()
+                    pending = None
+            if pending:
+                yield pending.encode()
+        except Exception as e:
+            # Headers are already sent, so the stream can only end early
+            logger.error(f"Activity stream failed: {str(e)}")
+        finally:
+            chunks.close()
+    
+    return Response(
+        generate(),
+        mimetype='text/plain',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @bp.route('/api/generate-task', methods=['POST'])
 def generate_task():
     """
@@ -139,84 +376,70 @@ def generate_task():
         "ai_model": "gpt-4"  // optional
     }
     """
-    try:
-        data = request.get_json()
-        
-        if not data or not data.get('user_input'):
-            return jsonify({
-                'success': False,
-                'error': 'user_input is required'
-            }), 400
-        
-        user_input = data['user_input']
-        task_type = data.get('task_type', 'feature')
-        project_id = data.get('project_id')
-        ai_model = data.get('ai_model')
-        
-        # Validate task type
-        valid_task_types = ['feature', 'bug_fix', 'improvement', 'technical_debt', 'research']
-        if task_type not in valid_task_types:
-            return jsonify({
-                'success': False,
-                'error': f'Invalid task_type. Must be one of: {", ".join(valid_task_types)}'
-            }), 400
-        
-        # Build context for AI generation
-        context = {}
-        
-        # Get project info if provided
-        if project_id:
-            project = Project.query.filter_by(taiga_project_id=project_id).first()
-            if project:
-                context['project_name'] = project.name
-        
-        # Get current user for position context
-        user_id = data.get('user_id', 1)
-        user = User.query.get(user_id)
-        
-        # Add user position context
-        if user and user.position:
-            context['user_position'] = user.position
-            context['position_prefix'] = user.position_prefix
-        
-        # Generate structured task using AI
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        result = loop.run_until_complete(
-            ai_service.generate_task_backlog_item(
-                user_input=user_input,
-                context=context,
-                model=ai_model,
-                task_type=task_type
-            )
+    data = _json()
+    
+    if not data or not data.get('user_input'):
+        return jsonify({
+            'success': False,
+            'error': 'user_input is required'
+        }), 400
+    
+    user_input = data['user_input']
+    task_type = data.get('task_type', 'feature')
+    project_id = data.get('project_id')
+    ai_model = data.get('ai_model')
+    
+    # Validate task type
+    if task_type not in _VALID_TASK_TYPES:
+        return jsonify({
+            'success': False,
+            'error': _INVALID_TASK_TYPE_ERROR
+        }), 400
+    
+    # Build context for AI generation
+    context = {}
+    
+    # Get project info if provided
+    if project_id:
+        project = Project.query.filter_by(taiga_project_id=project_id).first()
+        if project:
+            context['project_name'] = project.name
+    
+    # Get current user for position context
+    user_id = data.get('user_id', 1)
+    user = _get_user(user_id)
+    
+    # Add user position context
+    if user and user.position:
+        context['user_position'] = user.position
+        context['position_prefix'] = user.position_prefix
+    
+    # Generate structured task using AI
+    result = run_async(
+        ai_service.generate_task_backlog_item(
+            user_input=user_input,
+            context=context,
+            model=ai_model,
+            task_type=task_type
         )
+    )
+    
+    if result.get('success'):
+        task_data = result.get('task_data', {})
         
-        loop.close()
-        
-        if result.get('success'):
-            task_data = result.get('task_data', {})
-            
-            return jsonify({
-                'success': True,
-                'task': task_data,
-                'model_used': result.get('model_used'),
-                'provider': result.get('provider'),
-                'task_type': task_type,
-                'is_fallback': result.get('is_fallback', False)
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': result.get('error', 'Task generation failed'),
-                'fallback_task': result.get('fallback_task')
-            }), 500
-            
-    except Exception as e:
-        logger.error(f"Error in generate_task: {str(e)}")
+        return jsonify({
+            'success': True,
+            'task': task_data,
+            'model_used': result.get('model_used'),
+            'provider': result.get('provider'),
+            'task_type': task_type,
+            'is_fallback': result.get('is_fallback', False)
+        })
+    else:
         return jsonify({
             'success': False,
-            'error': 'Internal server error'
+            'error': result.get('error', 'Task generation failed'),
+            'fallback_task': result.get('fallback_task')
         }), 500
 
 
@@ -234,331 +457,313 @@ def submit_activity():
         "user_id": 456  // optional
     }
     """
-    try:
-        data = request.get_json()
-        
-        required_fields = ['project_id', 'description', 'hours', 'date']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({
-                    'success': False,
-                    'error': f'{field} is required'
-                }), 400
-        
-        project_id = data['project_id']
-        description = data['description']
-        hours = float(data['hours'])
-        activity_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
-        user_id = data.get('user_id')
-        
-        # Submit to Taiga
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        # Ensure authentication
-        auth_success = loop.run_until_complete(taiga_api.authenticate())
-        if not auth_success:
+    data = _json()
+    
+    required_fields = ['project_id', 'description', 'hours', 'date']
+    for field in required_fields:
+        if not data.get(field):
             return jsonify({
                 'success': False,
-                'error': 'Failed to authenticate with Taiga'
-            }), 401
-        
-        # Submit the activity
-        result = loop.run_until_complete(
-            taiga_api.submit_activity(
-                project_id=project_id,
-                description=description,
-                hours=hours,
-                activity_date=activity_date,
-                user_id=user_id
-            )
-        )
-        
-        loop.close()
-        
-        # Get user for position prefix
-        current_user = User.query.get(user_id or 1)
-        
-        # Apply position prefix to title if not already present
-        title = description[:200]  # Truncate for title
-        if current_user and current_user.position_prefix:
-            title = current_user.format_activity_title(title)
-        
-        # Store activity in local database
-        activity = Activity(
-            user_id=user_id or 1,  # Default user for now
-            project_id=None,  # We'll need to map this
-            title=title,
+                'error': f'{field} is required'
+            }), 400
+    
+    project_id = data['project_id']
+    description = data['description']
+    hours = float(data['hours'])
+    try:
+        activity_date = _parse_date(data['date'])
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': _INVALID_DATE_ERROR
+        }), 400
+    
+    user_id = data.get('user_id')
+    
+    # Submit to Taiga, ensuring authentication first
+    auth_success = run_async(taiga_api.authenticate())
+    if not auth_success:
+        return jsonify({
+            'success': False,
+            'error': 'Failed to authenticate with Taiga'
+        }), 401
+    
+    # Submit the activity
+    result = run_async(
+        taiga_api.submit_activity(
+            project_id=project_id,
             description=description,
-            hours_spent=hours,
+            hours=hours,
             activity_date=activity_date,
-            submitted_to_taiga=result.get('success', False),
-            taiga_activity_id=result.get('taiga_id'),
-            taiga_submission_error=result.get('error'),
-            ai_generated=True  # Mark as generated since it came through our system
+            user_id=user_id
         )
-        
-        db.session.add(activity)
-        db.session.commit()
-        
+    )
+    
+    # user_id is also Taiga's, so an id Taiga knows may have no local user;
+    # skip only the local row then, as its foreign key would fail in the writer
+    if user_id is not None and _get_user(user_id) is None:
+        logger.warning(f"Not storing activity locally: user {user_id} is not in the local database")
         return jsonify(result)
-        
-    except Exception as e:
-        logger.error(f"Error in submit_activity: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': 'Internal server error'
-        }), 500
+    
+    # Store activity in local database; the response does not depend on it,
+    # so the insert happens in the background (the writer adds the position prefix to the title)
+    activity_writer.submit({
+        'user_id': user_id or 1,  # Default user for now
+        'project_id': None,  # We'll need to map this
+        'title': description[:200],  # Truncate for title
+        'description': description,
+        'hours_spent': hours,
+        'activity_date': activity_date,
+        'submitted_to_taiga': result.get('success', False),
+        'taiga_activity_id': result.get('taiga_id'),
+        'taiga_submission_error': result.get('error'),
+        'ai_generated': True  # Mark as generated since it came through our system
+    })
+    
+    return jsonify(result)
 
 
 @bp.route('/api/projects')
 def get_projects():
     """Get list of user's projects from Taiga"""
-    try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        # Ensure authentication
-        auth_success = loop.run_until_complete(taiga_api.authenticate())
-        if not auth_success:
-            return jsonify({
-                'success': False,
-                'error': 'Failed to authenticate with Taiga'
-            }), 401
-        
-        # Get projects
-        projects = loop.run_until_complete(taiga_api.get_user_projects())
-        loop.close()
-        
-        return jsonify({
-            'success': True,
-            'projects': projects
-        })
-        
-    except Exception as e:
-        logger.error(f"Error in get_projects: {str(e)}")
+    # Ensure authentication
+    auth_success = run_async(taiga_api.authenticate())
+    if not auth_success:
         return jsonify({
             'success': False,
-            'error': 'Failed to fetch projects'
-        }), 500
+            'error': 'Failed to authenticate with Taiga'
+        }), 401
+    
+    # Get projects
+    projects = run_async(taiga_api.get_user_projects())
+    
+    return json_response({
+        'success': True,
+        'projects': projects
+    })
 
 
 @bp.route('/api/user-positions')
 def get_user_positions():
     """Get available user positions"""
-    try:
-        positions = UserPosition.query.filter_by(is_active=True).all()
-        
-        positions_data = []
-        for position in positions:
-            positions_data.append({
-                'id': position.id,
-                'position_name': position.position_name,
-                'position_prefix': position.position_prefix,
-                'description': position.description
-            })
-        
-        return jsonify({
-            'success': True,
-            'positions': positions_data
+    return cached_json_response('user-positions', _load_user_positions)
+
+
+def _load_user_positions():
+    # PostgreSQL builds the JSON array itself, so no rows are hydrated in Python
+    if db.engine.dialect.name == 'postgresql':
+        positions_json = db.session.execute(_ACTIVE_POSITIONS_JSON_SQL).scalar()
+        return b'{"success":true,"positions":' + positions_json.encode() + b'}'
+    
+    positions = UserPosition.query.filter_by(is_active=True).all()
+    
+    positions_data = []
+    for position in positions:
+        positions_data.append({
+            'id': position.id,
+            'position_name': position.position_name,
+            'position_prefix': position.position_prefix,
+            'description': position.description
         })
-        
-    except Exception as e:
-        logger.error(f"Error in get_user_positions: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': 'Failed to fetch positions'
-        }), 500
+    
+    return {
+        'success': True,
+        'positions': positions_data
+    }
 
 
 @bp.route('/api/set-user-position', methods=['POST'])
 def set_user_position():
     """Set user position"""
-    try:
-        data = request.get_json()
-        
-        if not data or not data.get('position_id'):
-            return jsonify({
-                'success': False,
-                'error': 'position_id is required'
-            }), 400
-        
-        position_id = data['position_id']
-        user_id = data.get('user_id', 1)  # Default user for now
-        
-        # Get position details
-        position = UserPosition.query.get(position_id)
-        if not position:
-            return jsonify({
-                'success': False,
-                'error': 'Position not found'
-            }), 404
-        
-        # Get or create user
-        user = User.query.get(user_id)
-        if not user:
-            # Create default user if doesn't exist
-            user = User(
-                username='default_user',
-                email='user@example.com',
-                position=position.position_name,
-                position_prefix=position.position_prefix
-            )
-            db.session.add(user)
-        else:
-            # Update existing user
-            user.position = position.position_name
-            user.position_prefix = position.position_prefix
-        
-        db.session.commit()
-        
+    data = _json()
+    
+    if not data or not data.get('position_id'):
         return jsonify({
-            'success': True,
-            'user': {
-                'id': user.id,
-                'username': user.username,
-                'position': user.position,
-                'position_prefix': user.position_prefix,
-                'activity_prefix': user.get_activity_prefix()
-            }
-        })
-        
-    except Exception as e:
-        logger.error(f"Error in set_user_position: {str(e)}")
+            'success': False,
+            'error': 'position_id is required'
+        }), 400
+    
+    position_id = data['position_id']
+    user_id = data.get('user_id', 1)  # Default user for now
+    
+    # PostgreSQL: update an existing user and read back the position in one statement
+    if db.engine.dialect.name == 'postgresql':
+        row = db.session.execute(
+            _SET_USER_POSITION_SQL, {'user_id': user_id, 'position_id': position_id}
+        ).first()
+        if row is not None:
+            db.session.commit()
+            invalidate_cached_responses()
+            return jsonify({
+                'success': True,
+                'user': {
+                    'id': row.id,
+                    'username': row.username,
+                    'position': row.position_name,
+                    'position_prefix': row.position_prefix,
+                    'activity_prefix': f"[{row.position_prefix}]"
+                }
+            })
+        # No row: the user or the position is missing, handled below
+    
+    # Get position details
+    position = UserPosition.query.get(position_id)
+    if not position:
         return jsonify({
             'success': False,
-            'error': 'Failed to set user position'
-        }), 500
+            'error': 'Position not found'
+        }), 404
+    
+    # Get or create user
+    user = _get_user(user_id)
+    if not user:
+        # Create default user if doesn't exist
+        user = User(
+            username='default_user',
+            email='user@example.com',
+            user_position=position
+        )
+        db.session.add(user)
+    else:
+        # Update existing user
+        user.user_position = position
+    
+    db.session.commit()
+    invalidate_cached_responses()
+    
+    return jsonify({
+        'success': True,
+        'user': {
+            'id': user.id,
+            'username': user.username,
+            'position': user.position,
+            'position_prefix': user.position_prefix,
+            'activity_prefix': user.get_activity_prefix()
+        }
+    })
 
 
 @bp.route('/api/add-position', methods=['POST'])
 def add_position():
     """Add a new position"""
-    try:
-        data = request.get_json()
-        
-        required_fields = ['position_name', 'position_prefix']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({
-                    'success': False,
-                    'error': f'{field} is required'
-                }), 400
-        
-        position_name = data['position_name']
-        position_prefix = data['position_prefix']
-        description = data.get('description', '')
-        
-        # Check if position already exists
-        existing_position = UserPosition.query.filter_by(position_name=position_name).first()
-        if existing_position:
+    data = _json()
+    
+    required_fields = ['position_name', 'position_prefix']
+    for field in required_fields:
+        if not data.get(field):
             return jsonify({
                 'success': False,
-                'error': 'Position already exists'
+                'error': f'{field} is required'
             }), 400
-        
-        # Create new position
-        new_position = UserPosition(
-            position_name=position_name,
-            position_prefix=position_prefix,
-            description=description,
-            is_active=True
-        )
-        
-        db.session.add(new_position)
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'position': {
-                'id': new_position.id,
-                'position_name': new_position.position_name,
-                'position_prefix': new_position.position_prefix,
-                'description': new_position.description
-            }
-        })
-        
-    except Exception as e:
-        logger.error(f"Error in add_position: {str(e)}")
+    
+    position_name = data['position_name']
+    position_prefix = data['position_prefix']
+    description = data.get('description', '')
+    
+    # Check if position already exists
+    existing_position = UserPosition.query.filter_by(position_name=position_name).first()
+    if existing_position:
         return jsonify({
             'success': False,
-            'error': 'Failed to add position'
-        }), 500
+            'error': 'Position already exists'
+        }), 400
+    
+    # Create new position
+    new_position = UserPosition(
+        position_name=position_name,
+        position_prefix=position_prefix,
+        description=description,
+        is_active=True
+    )
+    
+    db.session.add(new_position)
+    db.session.commit()
+    invalidate_cached_responses()
+    
+    return jsonify({
+        'success': True,
+        'position': {
+            'id': new_position.id,
+            'position_name': new_position.position_name,
+            'position_prefix': new_position.position_prefix,
+            'description': new_position.description
+        }
+    })
 
 
 @bp.route('/api/current-user')
 def get_current_user():
     """Get current user information"""
-    try:
-        # For now, return default user (user_id=1)
-        # In a real app, you'd get this from session/auth
-        user = User.query.get(1)
-        
-        if not user:
-            return jsonify({
-                'success': True,
-                'user': None
-            })
-        
-        return jsonify({
+    return cached_json_response('current-user', _load_current_user)
+
+
+def _load_current_user():
+    # For now, return default user (user_id=1)
+    # In a real app, you'd get this from session/auth
+    user = _get_user(1)
+    
+    if not user:
+        return {
             'success': True,
-            'user': {
-                'id': user.id,
-                'username': user.username,
-                'position': user.position,
-                'position_prefix': user.position_prefix,
-                'activity_prefix': user.get_activity_prefix()
-            }
-        })
-        
-    except Exception as e:
-        logger.error(f"Error in get_current_user: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': 'Failed to fetch user information'
-        }), 500
+            'user': None
+        }
+    
+    return {
+        'success': True,
+        'user': {
+            'id': user.id,
+            'username': user.username,
+            'position': user.position,
+            'position_prefix': user.position_prefix,
+            'activity_prefix': user.get_activity_prefix()
+        }
+    }
 
 
 @bp.route('/api/activities')
 def get_activities():
     """Get user's recent activities"""
-    try:
-        # Get query parameters
-        project_id = request.args.get('project_id', type=int)
-        limit = request.args.get('limit', default=20, type=int)
-        
-        # Query local database
-        query = Activity.query.order_by(Activity.created_at.desc())
-        
-        if project_id:
-            query = query.filter_by(project_id=project_id)
-        
-        activities = query.limit(limit).all()
-        
-        # Convert to JSON-serializable format
-        activities_data = []
+    # Get query parameters
+    project_id = request.args.get('project_id', type=int)
+    limit = request.args.get('limit', default=20, type=int)
+    
+    # Query local database, selecting only the serialized columns (no ORM objects)
+    query = (
+        db.session.query(
+            Activity.id,
+            Activity.title,
+            Activity.description,
+            Activity.hours_spent,
+            Activity.activity_date,
+            Activity.ai_generated,
+            Activity.submitted_to_taiga,
+            Activity.created_at,
+            UserPosition.position_name.label('user_position'),
+            UserPosition.position_prefix
+        )
+        .outerjoin(User, Activity.user_id == User.id)
+        .outerjoin(UserPosition, User.position_id == UserPosition.id)
+        .order_by(Activity.created_at.desc(), Activity.id.desc())
+    )
+    
+    if project_id:
+        query = query.filter(Activity.project_id == project_id)
+    
+    # Rows are fetched in batches and serialized into the response as they arrive;
+    # iterating here runs the query so database errors still surface as a 500
+    activities = iter(query.limit(limit).yield_per(_ACTIVITY_BATCH_SIZE))
+    
+    def generate():
+        yield b'{"success":true,"activities":['
+        separator = b''
         for activity in activities:
-            activities_data.append({
-                'id': activity.id,
-                'title': activity.title,
-                'description': activity.description,
-                'hours_spent': activity.hours_spent,
-                'activity_date': activity.activity_date.isoformat(),
-                'ai_generated': activity.ai_generated,
-                'submitted_to_taiga': activity.submitted_to_taiga,
-                'created_at': activity.created_at.isoformat(),
-                'user_position': activity.user.position if activity.user else None,
-                'position_prefix': activity.user.position_prefix if activity.user else None
-            })
-        
-        return jsonify({
-            'success': True,
-            'activities': activities_data
-        })
-        
-    except Exception as e:
-        logger.error(f"Error in get_activities: {str(e)}")
-        return jsonify({
-            'success': False,
-            'error': 'Failed to fetch activities'
-        }), 500
+            yield separator + dumps_bytes(activity._asdict())
+            separator = b','
+        yield b']}'
+    
+    body = stream_with_context(generate())
+    headers = {'Vary': 'Accept-Encoding'}
+    if request.accept_encodings['gzip']:
+        body = _gzip_stream(body, current_app.config.get('COMPRESS_LEVEL', 6))
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, mimetype='application/json', headers=headers)
\ No newline at end of file